@@ -6,7 +6,7 @@ Verifica dependências, módulos e configurações
 
 import sys
 import os
-import importlib
+import importlib.util
 from pathlib import Path
 
 def check_python_version():
@@ -32,10 +32,9 @@ def check_basic_dependencies():
     ]
     
     for module, name in basic_deps:
-        try:
-            importlib.import_module(module)
+        if importlib.util.find_spec(module) is not None:
             print(f"✅ {name}")
-        except ImportError:
+        else:
             print(f"❌ {name} - FALTANDO")
     print()
 
@@ -50,11 +49,11 @@ def check_ai_dependencies():
         ("diffusers", "Diffusers")
     ]
     
+    # find_spec só localiza o módulo: importar torch inicializaria o CUDA
     for module, name in ai_deps:
-        try:
-            importlib.import_module(module)
+        if importlib.util.find_spec(module) is not None:
             print(f"✅ {name}")
-        except ImportError:
+        else:
             print(f"⚪ {name} - não instalado (opcional)")
     print()
 
@@ -101,9 +100,11 @@ def check_upscaling_modules():
         ("modules.upscaling_realce_huggingface", "Hugging Face")
     ]
     
+    # Localiza os módulos sem executá-los (evita carregar torch/modelos)
     for module, name in modules:
         try:
-            importlib.import_module(module)
+            if importlib.util.find_spec(module) is None:
+                raise ImportError(f"módulo {module} não encontrado")
             print(f"✅ {name}")
         except ImportError as e:
             print(f"❌ {name} - Erro: {e}")
@@ -119,12 +120,14 @@ def check_streamlit_apps():
         print("❌ Diretório apps/ não encontrado")
         return
     
-    app_files = list(apps_dir.glob("app_*.py"))
+    # Uma única passada pelo glob, contando enquanto lista
+    count = 0
+    for app in apps_dir.glob("app_*.py"):
+        count += 1
+        print(f"✅ {app.name}")
     
-    if app_files:
-        print(f"Encontradas {len(app_files)} aplicações:")
-        for app in app_files:
-            print(f"✅ {app.name}")
+    if count:
+        print(f"Encontradas {count} aplicações")
     else:
         print("❌ Nenhuma aplicação encontrada")
     print()
@@ -0,0 +1,27 @@
+"""
+Optional-dependency probes shared by the upscaling modules
+One rule for every module, so they agree on what is available
+"""
+
+import functools
+import importlib
+import importlib.util
+
+# Modules cheap enough to really import when probed, so a broken install
+# (e.g. cv2 without libGL on a headless host) is reported as unavailable.
+# Everything else is only located with find_spec, without importing it
+IMPORT_PROBED_MODULES = frozenset({'cv2'})
+
+@functools.lru_cache(maxsize=None)
+def module_available(module_name):
+    """Whether an optional module can be used, probed once per process"""
+    if module_name in IMPORT_PROBED_MODULES:
+        try:
+            importlib.import_module(module_name)
+            return True
+        except Exception:
+            return False
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
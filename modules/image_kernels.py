@@ -0,0 +1,19 @@
+"""
+Convolution kernels shared by the upscaling modules
+Reproduce PIL's ImageEnhance filters as plain 3x3 kernels for cv2.filter2D
+"""
+
+import functools
+import numpy as np
+
+# PIL's ImageFilter.SMOOTH, normalised (what ImageEnhance.Sharpness blends with)
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+SMOOTH_KERNEL.flags.writeable = False
+
+@functools.lru_cache(maxsize=8)
+def sharpness_kernel(factor):
+    """PIL's ImageEnhance.Sharpness(factor) as one 3x3 kernel: factor*identity - (factor-1)*SMOOTH"""
+    kernel = -(factor - 1) * SMOOTH_KERNEL
+    kernel[1, 1] += factor
+    kernel.flags.writeable = False
+    return kernel
@@ -8,86 +8,133 @@ from PIL import Image, ImageFilter, ImageEnhance
 import io
 import logging
 import requests
+from requests.adapters import HTTPAdapter
 import os
 import tempfile
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from .capabilities import module_available
+except ImportError:
+    from capabilities import module_available
+try:
+    from .image_kernels import sharpness_kernel
+except ImportError:
+    from image_kernels import sharpness_kernel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# In-memory limit for the Waifu2x upload before it spills to disk
+UPLOAD_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# ITU-R 601 luma weights, as used by PIL's "L" conversion
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# Input values for the per-image contrast LUT
+CONTRAST_LUT_BASE = np.arange(256, dtype=np.float32)
+
+# PIL's ImageEnhance.Sharpness(1.2) as one 3x3 kernel: 1.2*identity - 0.2*SMOOTH
+SHARPNESS_FILTER = ImageFilter.Kernel((3, 3), sharpness_kernel(1.2).ravel().tolist(), scale=1)
+
+# cv2.resize channel limit (CV_CN_MAX) for channel-stacked batches
+MAX_BATCH_CHANNELS = 512
+
+# Distinct shapes a thread keeps scratch buffers for before they are dropped
+SCRATCH_MAX_SHAPES = 8
+
+# Optional packages probed with module_available: (method key, module, label)
+CAPABILITY_PROBES = (
+    ('huggingface', 'huggingface_hub', 'HuggingFace Hub'),
+    ('upscalers', 'upscalers', 'upscalers package'),
+    ('opencv', 'cv2', 'OpenCV'),
+)
+
+@functools.lru_cache(maxsize=1)
+def _detect_capabilities():
+    """Detect available methods once per process
+
+    Packages are only located, not imported, until a method actually runs;
+    OpenCV is imported for real (see capabilities.module_available). The
+    summary is logged here, once, not per instance.
+    """
+    methods = {}
+    missing = []
+    
+    for method, module_name, label in CAPABILITY_PROBES:
+        if module_available(module_name):
+            methods[method] = True
+        else:
+            missing.append(label)
+    
+    # PIL and the online APIs are always available
+    methods['pil'] = True
+    methods['online'] = True
+    
+    if missing and logger.isEnabledFor(logging.WARNING):
+        logger.warning(f"❌ Not available: {', '.join(missing)}")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(f"✅ Available upscaling methods: {list(methods)}")
+    
+    return methods
+
+# Probe (and log) once at import
+_detect_capabilities()
+
 class AdvancedUpscaler:
     """Advanced upscaler with multiple AI and classical methods"""
     
     def __init__(self):
         self.available_methods = self._check_available_methods()
         self.models_cache = {}
-        logger.info(f"Available upscaling methods: {list(self.available_methods.keys())}")
+        # Per-thread resize scratch buffers keyed by shape (instances are shared
+        # across the app's worker threads)
+        self._scratch_cache = threading.local()
+        # Keep-alive session so repeated API calls skip the TCP+TLS handshake
+        self._http = requests.Session()
+        self._http.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
     
     def _check_available_methods(self):
         """Check which upscaling methods are available"""
-        methods = {}
-        
-        # Check HuggingFace
-        try:
-            from huggingface_hub import hf_hub_download
-            methods['huggingface'] = True
-            logger.info("✅ HuggingFace Hub available")
-        except ImportError:
-            logger.warning("❌ HuggingFace Hub not available")
-        
-        # Check upscalers package
-        try:
-            import upscalers
-            methods['upscalers'] = upscalers
-            logger.info("✅ upscalers package available")
-        except ImportError:
-            logger.warning("❌ upscalers package not available")
-        
-        # Check opencv
-        try:
-            import cv2
-            methods['opencv'] = cv2
-            logger.info("✅ OpenCV available")
-        except ImportError:
-            logger.warning("❌ OpenCV not available")
-        
-        # Check PIL (always available)
-        methods['pil'] = Image
-        logger.info("✅ PIL available")
-        
-        # Check online APIs
-        methods['online'] = True
-        logger.info("✅ Online APIs available")
-        
-        return methods
+        return dict(_detect_capabilities())
     
-    def upscale_with_waifu2x_api(self, image, scale_factor=2, style='auto'):
-        """Upscale using Waifu2x online API"""
+    def upscale_with_waifu2x_api(self, image, scale_factor=2, style='auto', session=None):
+        """Upscale using Waifu2x online API
+
+        session overrides the shared keep-alive session (the race uses its
+        own, so it can close it).
+        """
         try:
             # Waifu2x API endpoint
             api_url = "https://api.waifu2x.udp.jp/api"
             
-            # Convert image to bytes
-            img_byte_arr = io.BytesIO()
-            image.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-            
-            # Prepare request
-            files = {'file': ('image.png', img_byte_arr, 'image/png')}
             data = {
                 'scale': int(scale_factor),
                 'noise': 1,  # Low noise reduction
                 'style': style
             }
             
-            logger.info(f"Calling Waifu2x API with scale={scale_factor}")
-            response = requests.post(api_url, files=files, data=data, timeout=60)
+            # Encode straight into the upload file (spills to disk past 8 MB);
+            # compress_level=1 is ~5x faster than the default for ~10% more bytes
+            with tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE) as upload:
+                image.save(upload, format='PNG', compress_level=1)
+                upload.seek(0)
+                files = {'file': ('image.png', upload, 'image/png')}
+                
+                logger.info(f"Calling Waifu2x API with scale={scale_factor}")
+                response = (session or self._http).post(api_url, files=files, data=data, timeout=60, stream=True)
             
-            if response.status_code == 200:
-                result_image = Image.open(io.BytesIO(response.content))
+            with response:
+                if response.status_code != 200:
+                    raise Exception(f"API returned status {response.status_code}")
+                
+                # Decode from the response stream instead of response.content
+                response.raw.decode_content = True
+                result_image = Image.open(response.raw)
+                result_image.load()
                 return result_image, f"Waifu2x API upscaling (scale={scale_factor})"
-            else:
-                raise Exception(f"API returned status {response.status_code}")
                 
         except Exception as e:
             logger.error(f"Waifu2x API failed: {e}")
@@ -120,54 +167,62 @@ class AdvancedUpscaler:
             raise
     
     def _enhanced_pil_upscale(self, image, scale_factor):
-        """Enhanced PIL upscaling with multiple passes and filters"""
+        """Enhanced upscaling: one LANCZOS resize, then one enhancement pass"""
         try:
-            # Multi-step upscaling for better quality
-            current_image = image
-            current_scale = 1.0
+            width, height = image.size
+            new_width = int(width * scale_factor)
+            new_height = int(height * scale_factor)
             
-            while current_scale < scale_factor:
-                step_scale = min(2.0, scale_factor / current_scale)
-                
-                width, height = current_image.size
-                new_width = int(width * step_scale)
-                new_height = int(height * step_scale)
-                
-                # Use LANCZOS for upscaling
-                current_image = current_image.resize((new_width, new_height), Image.LANCZOS)
-                
-                # Apply enhancement filters
-                current_image = self._apply_enhancement_filters(current_image)
-                
-                current_scale *= step_scale
+            # OpenCV's LANCZOS4 kernel is roughly twice as fast as PIL's;
+            # PIL stays as the fallback (and for modes cv2 can't take as uint8)
+            if 'opencv' in self.available_methods and image.mode in ('RGB', 'RGBA', 'L'):
+                import cv2
+                upscaled = Image.fromarray(cv2.resize(np.asarray(image), (new_width, new_height),
+                                                      interpolation=cv2.INTER_LANCZOS4))
+            else:
+                upscaled = image.resize((new_width, new_height), Image.LANCZOS)
             
-            return current_image
+            # Apply enhancement filters once, on the final size
+            return self._apply_enhancement_filters(upscaled)
             
         except Exception as e:
             logger.error(f"Enhanced PIL upscaling failed: {e}")
             raise
     
     def _apply_enhancement_filters(self, image):
-        """Apply enhancement filters to improve image quality"""
+        """Apply enhancement filters to improve image quality
+
+        Sharpening is a single 3x3 kernel pass. Contrast (1.1 around the mean
+        gray level, as ImageEnhance.Contrast does) is a per-value affine map,
+        so for RGB images it is applied as one 256-entry LUT gather. Color
+        (1.05) blends with the gray image: one cv2.addWeighted when OpenCV is
+        available.
+        """
         try:
-            # Slight sharpening
-            enhancer = ImageEnhance.Sharpness(image)
-            image = enhancer.enhance(1.2)
+            # Slight sharpening: ImageEnhance.Sharpness(1.2) folded into one kernel
+            image = image.filter(SHARPNESS_FILTER)
             
-            # Contrast enhancement
-            enhancer = ImageEnhance.Contrast(image)
-            image = enhancer.enhance(1.1)
+            if image.mode != 'RGB':
+                image = ImageEnhance.Contrast(image).enhance(1.1)
+                return ImageEnhance.Color(image).enhance(1.05)
             
-            # Color enhancement
-            enhancer = ImageEnhance.Color(image)
-            image = enhancer.enhance(1.05)
+            arr = np.asarray(image)
+            mean = float(arr.reshape(-1, 3).mean(axis=0) @ LUMA_WEIGHTS)
+            lut = np.clip(mean + 1.1 * (CONTRAST_LUT_BASE - mean) + 0.5, 0, 255).astype(np.uint8)
+            arr = lut[arr]
             
-            return image
+            if 'opencv' not in self.available_methods:
+                return ImageEnhance.Color(Image.fromarray(arr)).enhance(1.05)
+            
+            # Color(1.05) = 1.05*rgb - 0.05*gray, saturated to uint8
+            import cv2
+            gray = cv2.cvtColor(cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY), cv2.COLOR_GRAY2RGB)
+            return Image.fromarray(cv2.addWeighted(arr, 1.05, gray, -0.05, 0, dst=arr))
         except Exception as e:
             logger.warning(f"Enhancement filters failed: {e}")
             return image
     
-    def upscale_with_opencv_advanced(self, image, scale_factor=2, method='EDSR'):
+    def upscale_with_opencv_advanced(self, image, scale_factor=2, method='EDSR', blend=False):
         """Advanced OpenCV upscaling with super-resolution models"""
         if 'opencv' not in self.available_methods:
             raise ValueError("OpenCV not available")
@@ -175,11 +230,13 @@ class AdvancedUpscaler:
         try:
             import cv2
             
-            # Convert PIL to OpenCV format
-            if isinstance(image, Image.Image):
-                image_array = np.array(image)
-                # Convert RGB to BGR for OpenCV
-                image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+            # Interpolation is channel-independent, so PIL input stays RGB:
+            # no RGB<->BGR round trip and no extra np.array copy
+            is_pil = isinstance(image, Image.Image)
+            if is_pil:
+                if image.mode not in ('RGB', 'RGBA', 'L'):
+                    image = image.convert('RGB')
+                image_array = np.asarray(image)
             else:
                 image_array = image
             
@@ -188,13 +245,14 @@ class AdvancedUpscaler:
                 # This would require downloading EDSR or ESPCN models
                 # For now, use enhanced interpolation
                 logger.warning("Using enhanced interpolation (DNN models not available)")
-                result = self._opencv_enhanced_interpolation(image_array, scale_factor)
+                result = self._opencv_enhanced_interpolation(image_array, scale_factor, blend)
             except Exception as e:
                 logger.warning(f"DNN super-resolution failed: {e}")
                 result = self._opencv_enhanced_interpolation(image_array, scale_factor)
             
-            # Convert back to RGB
-            result = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
+            # Array input is BGR (OpenCV convention); convert back to RGB
+            if not is_pil:
+                result = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
             result_image = Image.fromarray(result)
             
             return result_image, f"OpenCV enhanced upscaling (scale={scale_factor})"
@@ -203,43 +261,42 @@ class AdvancedUpscaler:
             logger.error(f"OpenCV advanced upscaling failed: {e}")
             raise
     
-    def _opencv_enhanced_interpolation(self, image_array, scale_factor):
-        """Enhanced interpolation with multiple methods and blending"""
+    def _scratch_buffer(self, shape, dtype):
+        """Return a reusable per-thread buffer for intermediate resizes"""
+        buffers = getattr(self._scratch_cache, 'buffers', None)
+        if buffers is None:
+            buffers = self._scratch_cache.buffers = {}
+        key = (shape, np.dtype(dtype))
+        buffer = buffers.get(key)
+        if buffer is None:
+            if len(buffers) >= SCRATCH_MAX_SHAPES:
+                buffers.clear()
+            buffer = buffers[key] = np.empty(shape, dtype)
+        return buffer
+    
+    def _opencv_enhanced_interpolation(self, image_array, scale_factor, blend=False):
+        """LANCZOS4 interpolation, optionally blended with CUBIC and LINEAR
+
+        By default a single LANCZOS4 resize is performed. With blend=True the
+        0.5/0.3/0.2 LANCZOS4/CUBIC/LINEAR mix is computed on uint8 with
+        cv2.addWeighted (saturating SIMD multiply-add, no float32 buffers).
+        """
         import cv2  # Import here to avoid scope issues
         
-        try:
-            height, width = image_array.shape[:2]
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            
-            # Use multiple interpolation methods and blend
-            methods = [
-                cv2.INTER_LANCZOS4,
-                cv2.INTER_CUBIC,
-                cv2.INTER_LINEAR
-            ]
-            
-            results = []
-            for method in methods:
-                result = cv2.resize(image_array, (new_width, new_height), interpolation=method)
-                results.append(result.astype(np.float32))
-            
-            # Weighted average of methods
-            weights = [0.5, 0.3, 0.2]  # Prefer LANCZOS
-            blended = np.zeros_like(results[0])
-            
-            for result, weight in zip(results, weights):
-                blended += result * weight
-            
-            return blended.astype(np.uint8)
-            
-        except Exception as e:
-            logger.error(f"Enhanced interpolation failed: {e}")
-            # Fallback to simple LANCZOS
-            height, width = image_array.shape[:2]
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            return cv2.resize(image_array, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+        height, width = image_array.shape[:2]
+        new_size = (int(width * scale_factor), int(height * scale_factor))
+        result = cv2.resize(image_array, new_size, interpolation=cv2.INTER_LANCZOS4)
+        if not blend:
+            return result
+        
+        # CUBIC and LINEAR are only intermediates, so they go into a cached
+        # scratch buffer; the returned array is always freshly allocated
+        scratch = self._scratch_buffer((new_size[1], new_size[0]) + image_array.shape[2:],
+                                       image_array.dtype)
+        cubic = cv2.resize(image_array, new_size, interpolation=cv2.INTER_CUBIC, dst=scratch)
+        result = cv2.addWeighted(result, 0.5, cubic, 0.3, 0)
+        linear = cv2.resize(image_array, new_size, interpolation=cv2.INTER_LINEAR, dst=cubic)
+        return cv2.addWeighted(result, 1.0, linear, 0.2, 0, dst=result)
     
     def upscale_smart_auto(self, image, scale_factor=2.0, quality='high'):
         """Smart automatic upscaling that chooses the best method"""
@@ -269,6 +326,20 @@ class AdvancedUpscaler:
         methods_to_try.append(('enhanced_pil', scale_factor))
         
         last_error = None
+        method_names = [method_name for method_name, _ in methods_to_try]
+        
+        # When the API would be tried first with OpenCV behind it, run both at
+        # once instead of waiting out an API timeout before starting OpenCV
+        if method_names[0] == 'waifu2x' and 'opencv_advanced' in method_names:
+            try:
+                return self._race_waifu2x_opencv(image, scale_factor, quality)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"Methods waifu2x/opencv_advanced failed: {e}")
+                methods_to_try = [
+                    (method_name, scale) for method_name, scale in methods_to_try
+                    if method_name not in ('waifu2x', 'opencv_advanced')
+                ]
         
         for method_name, scale in methods_to_try:
             try:
@@ -277,7 +348,10 @@ class AdvancedUpscaler:
                 elif method_name == 'huggingface':
                     return self.upscale_with_huggingface_esrgan(image, scale)
                 elif method_name == 'opencv_advanced':
-                    return self.upscale_with_opencv_advanced(image, scale)
+                    # 'highest' keeps the multi-interpolation blend
+                    return self.upscale_with_opencv_advanced(
+                        image, scale, blend=(quality == 'highest')
+                    )
                 elif method_name == 'enhanced_pil':
                     return self._enhanced_pil_upscale(image, scale), f"Enhanced PIL (scale={scale})"
             except Exception as e:
@@ -287,6 +361,80 @@ class AdvancedUpscaler:
         
         raise Exception(f"All upscaling methods failed. Last error: {last_error}")
     
+    def _race_waifu2x_opencv(self, image, scale_factor, quality):
+        """Run the Waifu2x API and the OpenCV path concurrently
+
+        The API request runs on its own thread, with its own session, while
+        OpenCV runs on the calling thread. The first successful result wins:
+        if OpenCV finishes first, the API session is closed and the request
+        abandoned. If OpenCV fails, the API is awaited to its own timeout.
+        """
+        session = requests.Session()
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upscale-race")
+        api = executor.submit(self.upscale_with_waifu2x_api, image, scale_factor, session=session)
+        # Never blocks on the API thread; it ends with its request
+        executor.shutdown(wait=False)
+        
+        try:
+            local_result = self.upscale_with_opencv_advanced(
+                image, scale_factor, blend=(quality == 'highest')
+            )
+        except Exception as e:
+            logger.warning(f"Method opencv_advanced failed: {e}")
+            try:
+                return api.result()
+            finally:
+                session.close()
+        
+        if api.done() and api.exception() is None:
+            session.close()
+            return api.result()
+        
+        # OpenCV won: drop the pending request's connection
+        session.close()
+        return local_result
+    
+    def upscale_batch(self, images, scale_factor=2.0, quality='high'):
+        """Upscale several images, sharing one OpenCV pass for same-size inputs
+
+        Returns a list of (image, method) tuples in input order. Only the
+        'fast' quality (OpenCV first) is batched: the images are stacked
+        along the channel axis and interpolated together. Other qualities
+        go through upscale_smart_auto per image.
+        """
+        batchable = (
+            quality == 'fast'
+            and 'opencv' in self.available_methods
+            and len(images) > 1
+            and len({(image.size, image.mode) for image in images}) == 1
+            and images[0].mode in ('RGB', 'RGBA', 'L')
+        )
+        
+        if batchable:
+            try:
+                arrays = [np.asarray(image) for image in images]
+                channels = arrays[0].shape[2] if arrays[0].ndim == 3 else 1
+                per_call = max(1, MAX_BATCH_CHANNELS // channels)
+                method = f"OpenCV enhanced upscaling (scale={scale_factor}, batched)"
+                
+                results = []
+                for start in range(0, len(arrays), per_call):
+                    chunk = arrays[start:start + per_call]
+                    upscaled = self._opencv_enhanced_interpolation(np.dstack(chunk), scale_factor)
+                    if upscaled.ndim == 2:
+                        upscaled = upscaled[..., np.newaxis]
+                    for i in range(len(chunk)):
+                        frame = upscaled[..., i * channels:(i + 1) * channels]
+                        if channels == 1:
+                            frame = frame[..., 0]
+                        results.append((Image.fromarray(np.ascontiguousarray(frame)), method))
+                return results
+            except Exception as e:
+                logger.warning(f"Batched upscaling failed: {e}")
+        
+        return [self.upscale_smart_auto(image, scale_factor, quality) for image in images]
+    
     def list_available_methods(self):
         """List all available upscaling methods"""
         methods = {}
@@ -311,10 +459,20 @@ class AdvancedUpscaler:
         
         return methods
 
+# Shared instance for the legacy helpers
+_upscaler_instance = None
+
+def _get_upscaler():
+    """Return the module-wide AdvancedUpscaler, creating it on first use"""
+    global _upscaler_instance
+    if _upscaler_instance is None:
+        _upscaler_instance = AdvancedUpscaler()
+    return _upscaler_instance
+
 # Legacy functions for compatibility
 def upscale_image(image_path, output_path=None, scale_factor=2.0, method='auto', quality='high'):
     """Legacy function for backward compatibility"""
-    upscaler = AdvancedUpscaler()
+    upscaler = _get_upscaler()
     
     # Load image
     if isinstance(image_path, str):
@@ -330,7 +488,14 @@ def upscale_image(image_path, output_path=None, scale_factor=2.0, method='auto',
     
     # Save if output path provided
     if output_path:
-        result.save(output_path, quality=95)
+        # Fast encoder settings: zlib level 1 for PNG, no extra Huffman pass for JPEG
+        ext = os.path.splitext(output_path)[1].lower()
+        if ext == '.png':
+            result.save(output_path, compress_level=1)
+        elif ext in ('.jpg', '.jpeg'):
+            result.save(output_path, quality=95, optimize=False)
+        else:
+            result.save(output_path, quality=95)
         logger.info(f"Upscaled image saved to: {output_path}")
     
     return result, method_used
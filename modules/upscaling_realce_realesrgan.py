@@ -9,6 +9,11 @@ import numpy as np
 import cv2
 import torch
 import sys
+import functools
+try:
+    from .image_kernels import SMOOTH_KERNEL
+except ImportError:
+    from image_kernels import SMOOTH_KERNEL
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +36,22 @@ except ImportError as e:
         def predict(self, image):
             return image
 
+# Tiling helpers used by RealESRGAN.predict, for the stream-overlapped CUDA path
+try:
+    from RealESRGAN.utils import pad_reflect, split_image_into_overlapping_patches
+    STREAMED_PREDICT_AVAILABLE = torch.cuda.is_available()
+except ImportError:
+    STREAMED_PREDICT_AVAILABLE = False
+
+# Let cuDNN pick the fastest convolution algorithms for the fixed tile shape
+torch.backends.cudnn.benchmark = True
+
+# Tiling for the streamed prediction (same defaults as RealESRGAN.predict)
+TILE_SIZE = 192
+TILE_PADDING = 24
+TILE_BATCH_SIZE = 4
+TILE_PAD_SIZE = 15
+
 # --- Configurable Parameters ---
 MODEL_SCALE = 4  # Default scale factor
 BILATERAL_D = 9      # Bilateral filter diameter
@@ -38,6 +59,142 @@ BILATERAL_SIGMA_COLOR = 75
 BILATERAL_SIGMA_SPACE = 75
 SHARPNESS_FACTOR = 1.2  # Sharpness enhancement factor
 
+@functools.lru_cache(maxsize=4)
+def _get_model(device_str, scale, model_path):
+    """
+    Build a Real-ESRGAN model and load its weights once per (device, scale, weights).
+    
+    Returns:
+        RealESRGAN: Ready-to-use model (FP16 on CUDA)
+    """
+    device = torch.device(device_str)
+    model = RealESRGAN(device, scale=scale)
+    model.load_weights(model_path, download=True)
+    if device.type == 'cuda':
+        # FP16 weights: Tensor Core convolutions, half the memory traffic
+        model.model.half().eval()
+    logger.info(f"Real-ESRGAN model loaded successfully ({model_path}, scale: {scale}x)")
+    return model
+
+def _bilateral_gpu(image, d, sigma_color, sigma_space):
+    """
+    Bilateral filter on a (1, 3, H, W) float tensor in the 0-255 range.
+    
+    Mirrors cv2.bilateralFilter (circular window, L1 color distance, reflect-101
+    border) by accumulating one shifted neighbor at a time, so memory stays at a
+    few image-sized buffers instead of H*W*d*d.
+    """
+    radius = d // 2
+    height, width = image.shape[-2:]
+    padded = torch.nn.functional.pad(image, (radius, radius, radius, radius), mode='reflect')
+    numerator = torch.zeros_like(image)
+    denominator = torch.zeros_like(image[:, :1])
+    color_coeff = -0.5 / (sigma_color * sigma_color)
+    space_coeff = -0.5 / (sigma_space * sigma_space)
+    
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if dx * dx + dy * dy > radius * radius:
+                continue
+            neighbor = padded[..., radius + dy:radius + dy + height, radius + dx:radius + dx + width]
+            color_dist = (neighbor - image).abs().sum(dim=1, keepdim=True)
+            weight = torch.exp(color_dist.square() * color_coeff + (dx * dx + dy * dy) * space_coeff)
+            numerator.addcmul_(neighbor, weight)
+            denominator.add_(weight)
+    return numerator.div_(denominator)
+
+def _post_process_gpu(image):
+    """
+    GPU version of apply_post_processing on a (1, 3, H, W) float tensor (0-255):
+    bilateral filter, per-channel autocontrast, then PIL-style sharpness.
+    """
+    image = _bilateral_gpu(image, BILATERAL_D, BILATERAL_SIGMA_COLOR, BILATERAL_SIGMA_SPACE)
+    image = image.round_()
+    
+    # Autocontrast: stretch each channel's min..max to 0..255 (ImageOps.autocontrast)
+    low = image.amin(dim=(2, 3), keepdim=True)
+    high = image.amax(dim=(2, 3), keepdim=True)
+    span = high - low
+    image = torch.where(span > 0, (image - low) * (255.0 / span.clamp(min=1)), image).round_()
+    
+    # Sharpness: blend with PIL's SMOOTH kernel, leaving the 1-pixel border as is
+    kernel = torch.tensor(SMOOTH_KERNEL, device=image.device)
+    smooth = torch.nn.functional.conv2d(image, kernel.expand(3, 1, 3, 3), groups=3)
+    interior = image[..., 1:-1, 1:-1]
+    interior.copy_(smooth + SHARPNESS_FACTOR * (interior - smooth))
+    return image
+
+def _predict_streamed(model, image_np, post_process=False):
+    """
+    Tiled Real-ESRGAN prediction that overlaps host-to-device copies with compute.
+    
+    Tiles are staged in pinned memory as uint8 and uploaded batch by batch on a
+    side CUDA stream, so the copy of batch i+1 runs while batch i is computed.
+    Tiles are stitched on the GPU and, with post_process=True, the post-processing
+    filters run there too, before the single uint8 copy back to the host.
+    
+    Args:
+        model (RealESRGAN): Loaded model on a CUDA device
+        image_np (np.ndarray): RGB uint8 image
+        post_process (bool): Apply the post-processing filters on the GPU
+    
+    Returns:
+        np.ndarray: Upscaled RGB uint8 image
+    """
+    scale = model.scale
+    device = model.device
+    lr_image = pad_reflect(image_np, TILE_PAD_SIZE)
+    patches, p_shape = split_image_into_overlapping_patches(
+        lr_image, patch_size=TILE_SIZE, padding_size=TILE_PADDING
+    )
+    host_patches = torch.from_numpy(np.ascontiguousarray(patches, dtype=np.uint8)).pin_memory()
+    
+    copy_stream = torch.cuda.Stream(device)
+    compute_stream = torch.cuda.current_stream(device)
+    
+    def upload(start):
+        with torch.cuda.stream(copy_stream):
+            batch = host_patches[start:start + TILE_BATCH_SIZE].to(device, non_blocking=True)
+            ready = torch.cuda.Event()
+            ready.record(copy_stream)
+        return batch, ready
+    
+    # Tile outputs, already stripped of their padding, go straight into one
+    # uint8 buffer (truncated like RealESRGAN.predict): no float copies of
+    # the whole result are kept across batches
+    tile_padding = TILE_PADDING * scale
+    tile_size = TILE_SIZE * scale
+    tiles = torch.empty((host_patches.shape[0], 3, tile_size, tile_size), dtype=torch.uint8, device=device)
+    
+    pending = upload(0)
+    for start in range(0, host_patches.shape[0], TILE_BATCH_SIZE):
+        batch, ready = pending
+        compute_stream.wait_event(ready)
+        batch.record_stream(compute_stream)
+        if start + TILE_BATCH_SIZE < host_patches.shape[0]:
+            pending = upload(start + TILE_BATCH_SIZE)
+        
+        # NHWC -> NCHW view is already channels_last in memory
+        result = model.model(batch.permute(0, 3, 1, 2).float().div_(255))
+        result = result[..., tile_padding:-tile_padding, tile_padding:-tile_padding]
+        tiles[start:start + result.shape[0]].copy_(result.float().clamp_(0, 1).mul_(255))
+    
+    # Stitch on the GPU (same layout as RealESRGAN.utils.stich_together):
+    # lay the tiles out row-major, crop, then unpad
+    cols = (p_shape[1] - 2 * TILE_PADDING) // TILE_SIZE
+    rows = tiles.shape[0] // cols
+    sr_image = tiles.reshape(rows, cols, 3, tile_size, tile_size).permute(2, 0, 3, 1, 4)
+    sr_image = sr_image.reshape(1, 3, rows * tile_size, cols * tile_size)
+    pad = TILE_PAD_SIZE * scale
+    sr_image = sr_image[..., pad:lr_image.shape[0] * scale - pad, pad:lr_image.shape[1] * scale - pad]
+    
+    if post_process:
+        with torch.autocast('cuda', enabled=False):
+            sr_image = _post_process_gpu(sr_image.to(torch.float32, memory_format=torch.contiguous_format))
+        sr_image = sr_image.clamp_(0, 255).to(torch.uint8)
+    
+    return sr_image[0].permute(1, 2, 0).contiguous().cpu().numpy()
+
 def apply_realesrgan_upscaling(image, scale=4):
     """
     Apply Real-ESRGAN upscaling to an image using the official ai-forever implementation.
@@ -62,25 +219,19 @@ def apply_realesrgan_upscaling(image, scale=4):
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Initialize Real-ESRGAN model
-        model = RealESRGAN(device, scale=scale)
-        
-        # Load weights with automatic download
-        model_path = f'RealESRGAN_x{scale}.pth'
-        model.load_weights(model_path, download=True)
-        logger.info(f"Real-ESRGAN model loaded successfully (scale: {scale}x)")
+        # Get the cached Real-ESRGAN model (weights downloaded automatically)
+        model = _get_model(str(device), scale, f'RealESRGAN_x{scale}.pth')
         
         # Convert PIL image to numpy array
-        image_np = np.array(image)
+        image_np = np.asarray(image)
         
-        # Apply Real-ESRGAN upscaling
-        upscaled_image = model.predict(image_np)
-        
-        # Convert back to PIL Image
-        result = Image.fromarray(upscaled_image)
-        
-        # Apply post-processing filters
-        result = apply_post_processing(result)
+        # Apply Real-ESRGAN upscaling (FP16 via autocast on the GPU); on CUDA the
+        # post-processing filters also run on the GPU, before the copy back
+        with torch.inference_mode(), torch.autocast(device.type, dtype=torch.float16, enabled=device.type == 'cuda'):
+            if device.type == 'cuda' and STREAMED_PREDICT_AVAILABLE:
+                result = Image.fromarray(_predict_streamed(model, image_np, post_process=True))
+            else:
+                result = apply_post_processing(Image.fromarray(model.predict(image_np)))
         
         logger.info(f"Real-ESRGAN upscaling completed successfully. Scale: {scale}x")
         return result
@@ -129,14 +280,13 @@ def apply_post_processing(image):
         PIL.Image: Enhanced image
     """
     try:
-        # Convert to OpenCV format for bilateral filtering
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Apply bilateral filter for noise reduction while preserving edges
-        filtered = cv2.bilateralFilter(image_cv, BILATERAL_D, BILATERAL_SIGMA_COLOR, BILATERAL_SIGMA_SPACE)
+        # Apply bilateral filter for noise reduction while preserving edges.
+        # It treats channels symmetrically, so it runs on the RGB array as is
+        # (no RGB->BGR->RGB round trip)
+        filtered = cv2.bilateralFilter(np.asarray(image), BILATERAL_D, BILATERAL_SIGMA_COLOR, BILATERAL_SIGMA_SPACE)
         
         # Convert back to PIL
-        result = Image.fromarray(cv2.cvtColor(filtered, cv2.COLOR_BGR2RGB))
+        result = Image.fromarray(filtered)
         
         # Apply automatic contrast enhancement
         result = ImageOps.autocontrast(result)
@@ -181,19 +331,19 @@ def upscale_and_enhance_realesrgan(img_pil_input, model_name, model_scale, bilat
         if img_pil_input.mode != 'RGB':
             img_pil_input = img_pil_input.convert('RGB')
         
-        # Initialize Real-ESRGAN model
-        model = RealESRGAN(device, scale=model_scale)
-        model.load_weights(model_name, download=True)
+        # Get the cached Real-ESRGAN model
+        model = _get_model(str(device), model_scale, model_name)
         
         logger.info(f"Processing with Real-ESRGAN (Model: {model_name}, Scale: {model_scale}x)...")
         
         # Convert to numpy for Real-ESRGAN
-        image_np = np.array(img_pil_input)
-        sr_img = model.predict(image_np)
-        sr_img_pil = Image.fromarray(sr_img)
-        
-        # Apply post-processing
-        result = apply_post_processing(sr_img_pil)
+        image_np = np.asarray(img_pil_input)
+        # Upscale and post-process (both on the GPU when CUDA is available)
+        with torch.inference_mode(), torch.autocast(device.type, dtype=torch.float16, enabled=device.type == 'cuda'):
+            if device.type == 'cuda' and STREAMED_PREDICT_AVAILABLE:
+                result = Image.fromarray(_predict_streamed(model, image_np, post_process=True))
+            else:
+                result = apply_post_processing(Image.fromarray(model.predict(image_np)))
         
         logger.info("Real-ESRGAN processing completed!")
         return result
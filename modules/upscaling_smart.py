@@ -4,40 +4,78 @@ This is a reliable alternative to Real-ESRGAN with easier installation.
 """
 
 import logging
+import PIL
 from PIL import Image, ImageEnhance, ImageFilter, ImageOps
 import numpy as np
 import cv2
 import os
+import importlib.util
+try:
+    from .image_kernels import sharpness_kernel
+except ImportError:
+    from image_kernels import sharpness_kernel
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Try to import TensorFlow for SRCNN
-try:
-    import tensorflow as tf
-    TF_AVAILABLE = True
-    logger.info("✅ TensorFlow available for SRCNN!")
-except ImportError:
-    TF_AVAILABLE = False
-    logger.info("⚠️ TensorFlow not available. Using classical methods only.")
-
-# Try to import scikit-image for advanced processing
-try:
-    from skimage import restoration, filters, exposure
-    SKIMAGE_AVAILABLE = True
+# Check for scikit-image (gates the skimage method). Only its RGBA denoise
+# fallback still uses it, so it is imported there, on first use
+SKIMAGE_AVAILABLE = importlib.util.find_spec("skimage") is not None
+if SKIMAGE_AVAILABLE:
     logger.info("✅ Scikit-image available for advanced processing!")
-except ImportError:
-    SKIMAGE_AVAILABLE = False
+else:
     logger.info("⚠️ Scikit-image not available. Using basic processing only.")
 
+# Output rows per strip in apply_advanced_cv2_upscaling; the filters run strip
+# by strip so their intermediates stay cache-sized instead of full-frame
+STRIP_HEIGHT = 256
+
+# Extra rows each strip reads above and below: bilateral d=9 (4) plus the
+# Gaussian sigma=2.0 kernel (13x13, 6), so strips match the full-frame result
+STRIP_HALO = 4 + 6
+
+# Gamma 0.95 (as skimage's adjust_gamma) for uint8 values
+GAMMA_095_LUT = np.rint((np.arange(256) / 255.0) ** 0.95 * 255.0).astype(np.uint8)
+
+# Window of skimage's denoise_bilateral for its default sigma_spatial=1
+SKIMAGE_BILATERAL_WINDOW = 7
+
+# apply_best_pil_upscaling's unsharp mask (PIL UnsharpMask(1.5, 120, 3)):
+# Gaussian sigma 1.5 as a separable 9-tap kernel (~3 sigma each side)
+BEST_PIL_USM_KERNEL = cv2.getGaussianKernel(9, 1.5)
+BEST_PIL_USM_AMOUNT = 1.2
+BEST_PIL_USM_THRESHOLD = 3
+
+# Sharpness factor applied by apply_best_pil_upscaling
+BEST_PIL_SHARPNESS = 1.1
+
+def _apply_sharpness(image, factor):
+    """ImageEnhance.Sharpness(factor), as a single filter2D pass for RGB images"""
+    if image.mode == 'RGB':
+        return Image.fromarray(cv2.filter2D(np.asarray(image), -1, sharpness_kernel(factor)))
+    return ImageEnhance.Sharpness(image).enhance(factor)
+
+# Pillow-SIMD (versioned X.Y.Z.postN) resizes about as fast as OpenCV; stock
+# Pillow's LANCZOS is ~3x slower, so there cv2 does the resize
+PILLOW_SIMD = '.post' in PIL.__version__
+
+def _lanczos_resize(image, size):
+    """LANCZOS resize of a PIL image, through cv2 unless Pillow-SIMD is installed"""
+    if not PILLOW_SIMD and image.mode in ('RGB', 'RGBA', 'L'):
+        return Image.fromarray(cv2.resize(np.asarray(image), size, interpolation=cv2.INTER_LANCZOS4))
+    return image.resize(size, Image.LANCZOS)
+
 def is_enhanced_upscaling_available():
-    """Check if enhanced upscaling methods are available."""
-    return TF_AVAILABLE or SKIMAGE_AVAILABLE
+    """Check if enhanced upscaling methods are available.
+
+    The SRCNN-style method only needs OpenCV, which this module requires.
+    """
+    return True
 
 def apply_srcnn_upscaling(image, scale=2):
     """
-    Apply SRCNN (Super-Resolution CNN) upscaling using TensorFlow.
+    Apply SRCNN-style upscaling (bicubic resize plus contrast/brightness).
     
     Args:
         image (PIL.Image): Input image
@@ -46,35 +84,23 @@ def apply_srcnn_upscaling(image, scale=2):
     Returns:
         PIL.Image: Upscaled image or None if failed
     """
-    if not TF_AVAILABLE:
-        return None
-        
     try:
-        # Convert to numpy array
-        img_array = np.array(image)
-        
-        # Normalize to 0-1 range
-        img_normalized = img_array.astype(np.float32) / 255.0
-        
-        # Simple SRCNN-like processing using TensorFlow operations
-        img_tensor = tf.constant(img_normalized)
+        # Work on the uint8 array directly: bicubic resize needs no float copy
+        img_array = np.asarray(image)
         
-        # Add batch dimension
-        img_batch = tf.expand_dims(img_tensor, 0)
-        
-        # Simple upscaling with learned-like filters
+        # Simple SRCNN-style processing: bicubic upscaling plus enhancement.
         # This is a simplified version - in a real SRCNN you'd load a pre-trained model
-        upscaled = tf.image.resize(img_batch, 
-                                 [image.height * scale, image.width * scale], 
-                                 method='bicubic')
-        
-        # Apply some enhancement filters
-        enhanced = tf.image.adjust_contrast(upscaled, 1.1)
-        enhanced = tf.image.adjust_brightness(enhanced, 0.05)
-        
-        # Remove batch dimension and convert back
-        result_array = tf.squeeze(enhanced, 0).numpy()
-        result_array = np.clip(result_array * 255, 0, 255).astype(np.uint8)
+        upscaled = cv2.resize(img_array, (image.width * scale, image.height * scale),
+                              interpolation=cv2.INTER_CUBIC)
+        
+        # Contrast 1.1 around each channel's mean (as tf.image.adjust_contrast)
+        # and brightness +0.05 of full range, clipped to uint8: one cv2.LUT pass.
+        # The channel means are taken from the input, which resizing preserves
+        channels = 1 if img_array.ndim == 2 else img_array.shape[2]
+        means = np.array(cv2.mean(img_array)[:channels])
+        lut = np.clip(1.1 * np.arange(256)[:, np.newaxis] - 0.1 * means + 255 * 0.05, 0, 255)
+        lut = lut.astype(np.uint8).reshape(1, 256, channels)
+        result_array = cv2.LUT(upscaled, lut, dst=upscaled)
         
         result_image = Image.fromarray(result_array)
         logger.info("✅ SRCNN-style upscaling completed!")
@@ -96,29 +122,46 @@ def apply_advanced_cv2_upscaling(image, scale=2):
         PIL.Image: Upscaled image
     """
     try:
-        # Convert PIL to OpenCV
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        # bilateralFilter takes 1 or 3 channels: normalise RGBA/LA/P to RGB
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        
+        # Every step below is channel-symmetric, so the RGB array is used as
+        # is (no RGB<->BGR round trip)
+        img_array = np.asarray(image)
         
         # Calculate new dimensions
         new_width = int(image.width * scale)
         new_height = int(image.height * scale)
         
         # Method 1: Lanczos interpolation (best quality)
-        upscaled = cv2.resize(cv_image, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-        
-        # Method 2: Apply edge-preserving smoothing
-        smooth = cv2.edgePreservingFilter(upscaled, flags=1, sigma_s=50, sigma_r=0.4)
-        
-        # Method 3: Bilateral filtering for noise reduction while preserving edges
-        denoised = cv2.bilateralFilter(smooth, 9, 75, 75)
-        
-        # Method 4: Unsharp masking for sharpening
-        gaussian = cv2.GaussianBlur(denoised, (0, 0), 2.0)
-        sharpened = cv2.addWeighted(denoised, 1.5, gaussian, -0.5, 0)
+        upscaled = cv2.resize(img_array, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+        
+        # Methods 2 and 3 run in horizontal strips (with a halo) through two
+        # strip-sized scratch buffers; only the result is full-frame
+        sharpened = np.empty_like(upscaled)
+        strip_shape = (min(STRIP_HEIGHT + 2 * STRIP_HALO, new_height),) + upscaled.shape[1:]
+        denoised_buf = np.empty(strip_shape, dtype=upscaled.dtype)
+        gaussian_buf = np.empty(strip_shape, dtype=upscaled.dtype)
+        
+        for top in range(0, new_height, STRIP_HEIGHT):
+            bottom = min(top + STRIP_HEIGHT, new_height)
+            lo = max(top - STRIP_HALO, 0)
+            hi = min(bottom + STRIP_HALO, new_height)
+            
+            # Method 2: Bilateral filtering for noise reduction while preserving
+            # edges (it also covers the smoothing edgePreservingFilter used to add)
+            denoised = cv2.bilateralFilter(upscaled[lo:hi], 9, 75, 75, dst=denoised_buf[:hi - lo])
+            
+            # Method 3: Unsharp masking for sharpening, written straight into
+            # the strip's rows of the result
+            gaussian = cv2.GaussianBlur(denoised, (0, 0), 2.0, dst=gaussian_buf[:hi - lo])
+            cv2.addWeighted(denoised[top - lo:bottom - lo], 1.5,
+                            gaussian[top - lo:bottom - lo], -0.5, 0,
+                            dst=sharpened[top:bottom])
         
         # Convert back to PIL
-        result_rgb = cv2.cvtColor(sharpened, cv2.COLOR_BGR2RGB)
-        result_image = Image.fromarray(result_rgb)
+        result_image = Image.fromarray(sharpened)
         
         logger.info("✅ Advanced OpenCV upscaling completed!")
         return result_image
@@ -143,28 +186,39 @@ def apply_skimage_upscaling(image, scale=2):
         
     try:
         # Convert to numpy array
-        img_array = np.array(image)
+        img_array = np.asarray(image)
+        channel_axis = -1 if img_array.ndim == 3 else None
         
-        # First upscale with basic interpolation
-        from skimage.transform import resize
+        # First upscale with Lanczos interpolation (uint8, no float64 detour)
         new_height = int(image.height * scale)
         new_width = int(image.width * scale)
         
-        upscaled = resize(img_array, (new_height, new_width), 
-                         anti_aliasing=True, preserve_range=True)
-        
-        # Apply denoising
-        denoised = restoration.denoise_bilateral(upscaled, multichannel=True)
+        upscaled = cv2.resize(img_array, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+        
+        # Apply denoising on float32 in [0, 1], the range skimage expects
+        # (cast and scale in one ufunc pass, no intermediate float copy)
+        normalized = np.multiply(upscaled, 1 / 255, dtype=np.float32)
+        if channel_axis is None or normalized.shape[2] == 3:
+            # OpenCV's bilateral on the interleaved float32 pixels, with
+            # denoise_bilateral's defaults: sigma_color = image std,
+            # sigma_spatial = 1, 7x7 window
+            denoised = cv2.bilateralFilter(normalized, SKIMAGE_BILATERAL_WINDOW,
+                                           float(normalized.std()), 1.0)
+        else:
+            from skimage import restoration
+            denoised = restoration.denoise_bilateral(normalized, channel_axis=channel_axis)
         
-        # Enhance contrast
-        enhanced = exposure.adjust_gamma(denoised, gamma=0.95)
+        # Back to uint8 (the denoised values are non-negative, so the abs in
+        # convertScaleAbs is a no-op and it just scales, rounds and saturates)
+        enhanced = cv2.convertScaleAbs(denoised, alpha=255)
         
-        # Apply unsharp masking
-        blurred = filters.gaussian(enhanced, sigma=1)
-        sharpened = enhanced + 0.5 * (enhanced - blurred)
+        # Enhance contrast: gamma 0.95 as one table lookup instead of a pow() per value
+        cv2.LUT(enhanced, GAMMA_095_LUT, dst=enhanced)
         
-        # Convert back to uint8 and PIL
-        result_array = np.clip(sharpened, 0, 255).astype(np.uint8)
+        # Apply unsharp masking: enhanced + 0.5 * (enhanced - blurred),
+        # saturated to uint8 in a single addWeighted pass
+        blurred = cv2.GaussianBlur(enhanced, (0, 0), 1.0)
+        result_array = cv2.addWeighted(enhanced, 1.5, blurred, -0.5, 0)
         result_image = Image.fromarray(result_array)
         
         logger.info("✅ Scikit-image upscaling completed!")
@@ -174,13 +228,14 @@ def apply_skimage_upscaling(image, scale=2):
         logger.warning(f"Scikit-image upscaling failed: {e}")
         return None
 
-def apply_best_pil_upscaling(image, scale=2):
+def apply_best_pil_upscaling(image, scale=2, sharpness=1.0):
     """
     Apply the best possible PIL upscaling with multiple enhancement steps.
     
     Args:
         image (PIL.Image): Input image
         scale (int): Upscaling factor
+        sharpness (float): Extra sharpness factor, folded into the built-in one
     
     Returns:
         PIL.Image: Upscaled image
@@ -191,24 +246,51 @@ def apply_best_pil_upscaling(image, scale=2):
         new_height = int(image.height * scale)
         
         # Step 1: Initial upscaling with LANCZOS
-        upscaled = image.resize((new_width, new_height), Image.LANCZOS)
+        upscaled = _lanczos_resize(image, (new_width, new_height))
         
         # Step 2: Apply multiple enhancement filters
         
         # 2a: Sharpen the image
-        sharpened = upscaled.filter(ImageFilter.UnsharpMask(radius=1.5, percent=120, threshold=3))
-        
-        # 2b: Enhance details
-        detail_enhancer = ImageEnhance.Sharpness(sharpened)
-        detailed = detail_enhancer.enhance(1.1)
-        
-        # 2c: Slight contrast boost
-        contrast_enhancer = ImageEnhance.Contrast(detailed)
-        contrasted = contrast_enhancer.enhance(1.05)
-        
-        # 2d: Color enhancement
-        color_enhancer = ImageEnhance.Color(contrasted)
-        final_image = color_enhancer.enhance(1.05)
+        if upscaled.mode == 'RGB':
+            # Same unsharp mask with OpenCV: separable blur, one saturating
+            # addWeighted, and the original kept where |image - blurred| < 3
+            arr = np.asarray(upscaled)
+            blurred = cv2.sepFilter2D(arr, -1, BEST_PIL_USM_KERNEL, BEST_PIL_USM_KERNEL)
+            sharp = cv2.addWeighted(arr, 1 + BEST_PIL_USM_AMOUNT, blurred, -BEST_PIL_USM_AMOUNT, 0)
+            diff = cv2.absdiff(arr, blurred)
+            _, low_contrast_mask = cv2.threshold(diff, BEST_PIL_USM_THRESHOLD - 1, 255, cv2.THRESH_BINARY_INV)
+            cv2.copyTo(arr, low_contrast_mask, dst=sharp)
+            sharpened = Image.fromarray(sharp)
+        else:
+            sharpened = upscaled.filter(ImageFilter.UnsharpMask(radius=1.5, percent=120, threshold=3))
+        
+        if sharpened.mode == 'RGB':
+            # 2b-2d in one float pass: Sharpness(1.1) via filter2D (with any
+            # extra sharpness folded into the same kernel), then
+            # Contrast(c) and Color(k) are both blends with gray, so together
+            # they reduce to k*c*x - (k-1)*c*gray(x) - (c-1)*mean(gray(x))
+            contrast, color = 1.05, 1.05
+            detailed = cv2.filter2D(np.asarray(sharpened), cv2.CV_32F,
+                                    sharpness_kernel(BEST_PIL_SHARPNESS * sharpness))
+            gray = cv2.cvtColor(detailed, cv2.COLOR_RGB2GRAY)
+            mean = float(gray.mean())
+            gray = cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+            final_array = cv2.addWeighted(detailed, color * contrast,
+                                          gray, -(color - 1) * contrast,
+                                          -(contrast - 1) * mean, dtype=cv2.CV_8U)
+            final_image = Image.fromarray(final_array)
+        else:
+            # 2b: Enhance details
+            detail_enhancer = ImageEnhance.Sharpness(sharpened)
+            detailed = detail_enhancer.enhance(BEST_PIL_SHARPNESS * sharpness)
+            
+            # 2c: Slight contrast boost
+            contrast_enhancer = ImageEnhance.Contrast(detailed)
+            contrasted = contrast_enhancer.enhance(1.05)
+            
+            # 2d: Color enhancement
+            color_enhancer = ImageEnhance.Color(contrasted)
+            final_image = color_enhancer.enhance(1.05)
         
         logger.info("✅ Best PIL upscaling completed!")
         return final_image
@@ -217,7 +299,7 @@ def apply_best_pil_upscaling(image, scale=2):
         logger.error(f"Best PIL upscaling failed: {e}")
         return image
 
-def upscale_and_enhance_smart(image, scale=2, method='auto'):
+def upscale_and_enhance_smart(image, scale=2, method='auto', sharpness=1.0):
     """
     Smart upscaling that tries the best available method.
     
@@ -225,18 +307,32 @@ def upscale_and_enhance_smart(image, scale=2, method='auto'):
         image (PIL.Image): Input image
         scale (int): Upscaling factor
         method (str): 'auto', 'srcnn', 'opencv', 'skimage', 'pil'
+        sharpness (float): Extra sharpness factor for the result (1.0 = none)
     
     Returns:
         PIL.Image: Upscaled and enhanced image
     """
+    def best_pil(image, scale):
+        # PIL Best folds the extra sharpness into its own Sharpness pass
+        return apply_best_pil_upscaling(image, scale, sharpness)
+    
+    def sharpened(method_func):
+        # The other methods get it as one extra pass over their result
+        def run(image, scale):
+            result = method_func(image, scale)
+            if result and sharpness != 1.0:
+                result = _apply_sharpness(result, sharpness)
+            return result
+        return run
+    
     try:
         if method == 'auto':
             # Try methods in order of quality
             methods_to_try = [
-                ('SRCNN', apply_srcnn_upscaling),
-                ('Scikit-image', apply_skimage_upscaling),
-                ('OpenCV Advanced', apply_advanced_cv2_upscaling),
-                ('PIL Best', apply_best_pil_upscaling)
+                ('SRCNN', sharpened(apply_srcnn_upscaling)),
+                ('Scikit-image', sharpened(apply_skimage_upscaling)),
+                ('OpenCV Advanced', sharpened(apply_advanced_cv2_upscaling)),
+                ('PIL Best', best_pil)
             ]
             
             for method_name, method_func in methods_to_try:
@@ -250,15 +346,15 @@ def upscale_and_enhance_smart(image, scale=2, method='auto'):
             return image
             
         elif method == 'srcnn':
-            return apply_srcnn_upscaling(image, scale) or apply_best_pil_upscaling(image, scale)
+            return sharpened(apply_srcnn_upscaling)(image, scale) or best_pil(image, scale)
         elif method == 'opencv':
-            return apply_advanced_cv2_upscaling(image, scale) or apply_best_pil_upscaling(image, scale)
+            return sharpened(apply_advanced_cv2_upscaling)(image, scale) or best_pil(image, scale)
         elif method == 'skimage':
-            return apply_skimage_upscaling(image, scale) or apply_best_pil_upscaling(image, scale)
+            return sharpened(apply_skimage_upscaling)(image, scale) or best_pil(image, scale)
         elif method == 'pil':
-            return apply_best_pil_upscaling(image, scale)
+            return best_pil(image, scale)
         else:
-            return apply_best_pil_upscaling(image, scale)
+            return best_pil(image, scale)
             
     except Exception as e:
         logger.error(f"Smart upscaling failed: {e}")
@@ -274,15 +370,12 @@ def upscale_and_enhance_realesrgan(img_pil_input, model_name, model_scale, bilat
         # Map model_scale to appropriate scale factor
         scale = min(model_scale, 4)  # Support up to 4x scaling
         
-        # Use the smart upscaling method
-        result = upscale_and_enhance_smart(img_pil_input, scale=scale, method='auto')
+        # Additional sharpening if requested, capped at 2.0 to avoid artifacts;
+        # passed down so it shares a pass with the method's own sharpening
+        sharpness = min(sharpness_factor, 2.0) if sharpness_factor > 1.0 else 1.0
         
-        # Apply additional sharpening if requested
-        if sharpness_factor > 1.0:
-            enhancer = ImageEnhance.Sharpness(result)
-            result = enhancer.enhance(min(sharpness_factor, 2.0))  # Cap at 2.0 to avoid artifacts
-        
-        return result
+        # Use the smart upscaling method
+        return upscale_and_enhance_smart(img_pil_input, scale=scale, method='auto', sharpness=sharpness)
         
     except Exception as e:
         logger.error(f"Legacy function failed: {e}")
@@ -4,14 +4,142 @@ Provides a simple interface for various upscaling methods
 """
 
 import numpy as np
+import PIL
 from PIL import Image, ImageFilter, ImageEnhance
 import io
 import logging
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+try:
+    from .capabilities import module_available
+except ImportError:
+    from capabilities import module_available
+try:
+    from .image_kernels import sharpness_kernel
+except ImportError:
+    from image_kernels import sharpness_kernel
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# PIL's ImageEnhance.Sharpness(1.1) as a single 3x3 kernel: 1.1*identity - 0.1*SMOOTH
+SHARPNESS_KERNEL = sharpness_kernel(1.1)
+
+# Input values for the per-image contrast LUT
+CONTRAST_LUT_BASE = np.arange(256, dtype=np.float32)
+
+# Pillow-SIMD (versioned X.Y.Z.postN) resizes about as fast as OpenCV; stock
+# Pillow's LANCZOS is ~3x slower, so there cv2 does the resize
+PILLOW_SIMD = '.post' in PIL.__version__
+
+# PIL resampling filters by name
+PIL_RESAMPLING_METHODS = {
+    'LANCZOS': Image.LANCZOS,
+    'BICUBIC': Image.BICUBIC,
+    'BILINEAR': Image.BILINEAR,
+    'NEAREST': Image.NEAREST
+}
+
+@functools.lru_cache(maxsize=1)
+def _opencv_interpolation_methods():
+    """OpenCV interpolation flags by name, built on first use (cv2 is imported lazily)"""
+    import cv2
+    return {
+        'LANCZOS': cv2.INTER_LANCZOS4,
+        'CUBIC': cv2.INTER_CUBIC,
+        'LINEAR': cv2.INTER_LINEAR,
+        'AREA': cv2.INTER_AREA,
+        'INTER_NEAREST': cv2.INTER_NEAREST
+    }
+
+# Files the legacy upscale_image may decode and encode with OpenCV directly
+OPENCV_FILE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Optional packages probed with module_available: (method key, module, label)
+CAPABILITY_PROBES = (
+    ('upscalers', 'upscalers', 'upscalers package'),
+    ('opencv', 'cv2', 'OpenCV'),
+    ('tensorflow', 'tensorflow', 'TensorFlow'),
+)
+
+@functools.lru_cache(maxsize=1)
+def _detect_capabilities():
+    """Detect available methods once per process
+
+    TensorFlow and friends are only located, not imported, just to build an
+    upscaler; OpenCV is imported for real (see capabilities.module_available).
+    """
+    methods = {}
+    
+    for method, module_name, label in CAPABILITY_PROBES:
+        if module_available(module_name):
+            methods[method] = True
+            logger.info(f"✅ {label} available")
+        else:
+            logger.warning(f"❌ {label} not available")
+    
+    # PIL is always available
+    methods['pil'] = True
+    logger.info("✅ PIL available")
+    
+    return methods
+
+@functools.lru_cache(maxsize=1)
+def _list_upscalers():
+    """Models from the upscalers package, enumerated once per process"""
+    import upscalers
+    return tuple(upscalers.list_upscalers())
+
+@functools.lru_cache(maxsize=1)
+def _preferred_upscaler_model():
+    """Default AI model, resolved once per process: the first (R-)ESRGAN model, else the first model"""
+    available_models = _list_upscalers()
+    preferred_models = [m for m in available_models if 'ESRGAN' in m.upper()]
+    if preferred_models:
+        return preferred_models[0]
+    return available_models[0] if available_models else None
+
+def _post_process_array(image_array, gray_code):
+    """OpenCV version of UnifiedUpscaler._post_process_image for 3-channel uint8 arrays
+    
+    gray_code is the cvtColor code to luminance, so RGB and BGR arrays
+    both work. Returns a new array.
+    """
+    import cv2
+    
+    # Sharpness(1.1) as one filter2D pass, saturated to uint8
+    arr = cv2.filter2D(image_array, -1, SHARPNESS_KERNEL)
+    
+    # Contrast(1.05) blends with the mean luminance, so it is a
+    # per-pixel function: one 256-entry LUT
+    mean = int(cv2.cvtColor(arr, gray_code).mean() + 0.5)
+    lut = np.clip(CONTRAST_LUT_BASE * 1.05 - 0.05 * mean + 0.5, 0, 255).astype(np.uint8)
+    cv2.LUT(arr, lut, dst=arr)
+    
+    return arr
+
+def _upscale_shared(in_name, in_shape, out_name, out_shape, interp):
+    """Process-pool worker: resize (and post-process RGB) between shared memory blocks"""
+    import cv2
+    
+    shm_in = shared_memory.SharedMemory(name=in_name)
+    shm_out = shared_memory.SharedMemory(name=out_name)
+    src = dst = None
+    try:
+        src = np.ndarray(in_shape, dtype=np.uint8, buffer=shm_in.buf)
+        dst = np.ndarray(out_shape, dtype=np.uint8, buffer=shm_out.buf)
+        cv2.resize(src, (out_shape[1], out_shape[0]), dst=dst, interpolation=interp)
+        if dst.ndim == 3 and dst.shape[2] == 3:
+            dst[...] = _post_process_array(dst, cv2.COLOR_RGB2GRAY)
+    finally:
+        # Views must be released before the blocks can be closed
+        del src, dst
+        shm_in.close()
+        shm_out.close()
+
 class UnifiedUpscaler:
     """Unified interface for multiple upscaling methods"""
     
@@ -21,37 +149,7 @@ class UnifiedUpscaler:
     
     def _check_available_methods(self):
         """Check which upscaling methods are available"""
-        methods = {}
-        
-        # Check upscalers package
-        try:
-            import upscalers
-            methods['upscalers'] = upscalers
-            logger.info("✅ upscalers package available")
-        except ImportError:
-            logger.warning("❌ upscalers package not available")
-        
-        # Check opencv for classical methods
-        try:
-            import cv2
-            methods['opencv'] = cv2
-            logger.info("✅ OpenCV available")
-        except ImportError:
-            logger.warning("❌ OpenCV not available")
-        
-        # Check PIL (always available)
-        methods['pil'] = Image
-        logger.info("✅ PIL available")
-        
-        # Check tensorflow for AI methods
-        try:
-            import tensorflow as tf
-            methods['tensorflow'] = tf
-            logger.info("✅ TensorFlow available")
-        except ImportError:
-            logger.warning("❌ TensorFlow not available")
-        
-        return methods
+        return dict(_detect_capabilities())
     
     def list_available_models(self):
         """List all available upscaling models"""
@@ -59,8 +157,7 @@ class UnifiedUpscaler:
         
         if 'upscalers' in self.available_methods:
             try:
-                import upscalers
-                models['AI Models (upscalers)'] = upscalers.list_upscalers()
+                models['AI Models (upscalers)'] = list(_list_upscalers())
             except Exception as e:
                 logger.error(f"Error listing upscalers models: {e}")
         
@@ -81,16 +178,10 @@ class UnifiedUpscaler:
             
             # Get available models if none specified
             if model_name is None:
-                available_models = upscalers.list_upscalers()
-                if not available_models:
-                    raise ValueError("No upscaling models available")
-                
                 # Prefer R-ESRGAN or ESRGAN models
-                preferred_models = [m for m in available_models if 'ESRGAN' in m.upper()]
-                if preferred_models:
-                    model_name = preferred_models[0]
-                else:
-                    model_name = available_models[0]
+                model_name = _preferred_upscaler_model()
+                if model_name is None:
+                    raise ValueError("No upscaling models available")
             
             logger.info(f"Using AI model: {model_name}")
             result = upscalers.upscale(model_name, image, scale_factor)
@@ -109,9 +200,9 @@ class UnifiedUpscaler:
         try:
             import cv2
             
-            # Convert PIL to OpenCV format
+            # Convert PIL to OpenCV format (arrays are used as they are)
             if isinstance(image, Image.Image):
-                image_array = np.array(image)
+                image_array = np.asarray(image)
             else:
                 image_array = image
             
@@ -121,15 +212,7 @@ class UnifiedUpscaler:
             new_height = int(height * scale_factor)
             
             # Choose interpolation method
-            interpolation_methods = {
-                'LANCZOS': cv2.INTER_LANCZOS4,
-                'CUBIC': cv2.INTER_CUBIC,
-                'LINEAR': cv2.INTER_LINEAR,
-                'AREA': cv2.INTER_AREA,
-                'INTER_NEAREST': cv2.INTER_NEAREST
-            }
-            
-            interp = interpolation_methods.get(method, cv2.INTER_LANCZOS4)
+            interp = self._opencv_interpolation(method)
             
             # Upscale
             upscaled = cv2.resize(image_array, (new_width, new_height), interpolation=interp)
@@ -146,6 +229,81 @@ class UnifiedUpscaler:
             logger.error(f"OpenCV upscaling failed: {e}")
             raise
     
+    def _opencv_interpolation(self, method):
+        """Map an interpolation name to its OpenCV flag"""
+        interpolation_methods = _opencv_interpolation_methods()
+        return interpolation_methods.get(method, interpolation_methods['LANCZOS'])
+    
+    def upscale_batch(self, images, scale_factor=2.0, method='LANCZOS'):
+        """Upscale a list of images in parallel
+        
+        cv2.resize releases the GIL, so the images are spread over a thread
+        pool.
+        """
+        if 'opencv' not in self.available_methods:
+            results = [self.upscale_with_pil(image, scale_factor, method)[0] for image in images]
+            return results, f"PIL batch upscaling with {method}"
+        
+        import cv2
+        
+        arrays = [np.asarray(image) for image in images]
+        interp = self._opencv_interpolation(method)
+        
+        def _upscale_one(i):
+            height, width = arrays[i].shape[:2]
+            dsize = (int(width * scale_factor), int(height * scale_factor))
+            upscaled = cv2.resize(arrays[i], dsize, interpolation=interp)
+            return self._post_process_image(Image.fromarray(upscaled))
+        
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = list(executor.map(_upscale_one, range(len(arrays))))
+        
+        return results, f"OpenCV batch upscaling with {method}"
+    
+    def upscale_many(self, images, scale_factor=2.0, method='LANCZOS', workers=None):
+        """Upscale a list of images with OpenCV across worker processes
+        
+        Pixels travel through shared memory blocks instead of being pickled.
+        AI models are never used here (one process per model would fight over
+        the GPU); without OpenCV this falls back to upscale_batch.
+        """
+        if 'opencv' not in self.available_methods:
+            return self.upscale_batch(images, scale_factor, method)
+        
+        interp = self._opencv_interpolation(method)
+        blocks = []
+        try:
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+                futures = []
+                for image in images:
+                    arr = np.asarray(image, dtype=np.uint8)
+                    height, width = arr.shape[:2]
+                    out_shape = (int(height * scale_factor), int(width * scale_factor)) + arr.shape[2:]
+                    
+                    shm_in = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                    blocks.append(shm_in)
+                    shm_out = shared_memory.SharedMemory(create=True, size=max(int(np.prod(out_shape)), 1))
+                    blocks.append(shm_out)
+                    np.ndarray(arr.shape, dtype=np.uint8, buffer=shm_in.buf)[...] = arr
+                    
+                    futures.append((shm_out, out_shape, executor.submit(
+                        _upscale_shared, shm_in.name, arr.shape, shm_out.name, out_shape, interp)))
+                
+                results = []
+                for shm_out, out_shape, future in futures:
+                    future.result()
+                    # Copy out of the block before it is unlinked
+                    result = Image.fromarray(np.array(np.ndarray(out_shape, dtype=np.uint8, buffer=shm_out.buf)))
+                    if len(out_shape) != 3 or out_shape[2] != 3:
+                        result = self._post_process_image(result)
+                    results.append(result)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        
+        return results, f"OpenCV multi-process upscaling with {method}"
+    
     def upscale_with_pil(self, image, scale_factor=2.0, method='LANCZOS'):
         """Upscale using PIL resampling methods"""
         try:
@@ -155,17 +313,16 @@ class UnifiedUpscaler:
             new_height = int(height * scale_factor)
             
             # Choose resampling method
-            resampling_methods = {
-                'LANCZOS': Image.LANCZOS,
-                'BICUBIC': Image.BICUBIC,
-                'BILINEAR': Image.BILINEAR,
-                'NEAREST': Image.NEAREST
-            }
-            
-            resample = resampling_methods.get(method, Image.LANCZOS)
+            resample = PIL_RESAMPLING_METHODS.get(method, Image.LANCZOS)
             
-            # Upscale
-            result = image.resize((new_width, new_height), resample)
+            # Upscale (LANCZOS through cv2 when OpenCV is faster than this Pillow)
+            if (resample == Image.LANCZOS and not PILLOW_SIMD
+                    and 'opencv' in self.available_methods and image.mode in ('RGB', 'RGBA', 'L')):
+                import cv2
+                result = Image.fromarray(cv2.resize(np.asarray(image), (new_width, new_height),
+                                                    interpolation=cv2.INTER_LANCZOS4))
+            else:
+                result = image.resize((new_width, new_height), resample)
             
             # Apply post-processing
             result = self._post_process_image(result)
@@ -179,6 +336,11 @@ class UnifiedUpscaler:
     def _post_process_image(self, image):
         """Apply post-processing to enhance image quality"""
         try:
+            if 'opencv' in self.available_methods and image.mode == 'RGB':
+                import cv2
+                
+                return Image.fromarray(_post_process_array(np.asarray(image), cv2.COLOR_RGB2GRAY))
+            
             # Apply slight sharpening
             enhancer = ImageEnhance.Sharpness(image)
             image = enhancer.enhance(1.1)
@@ -192,6 +354,37 @@ class UnifiedUpscaler:
             logger.warning(f"Post-processing failed: {e}")
             return image
     
+    def _upscale_file_opencv(self, image_path, output_path, scale_factor):
+        """File-to-file OpenCV upscaling that stays in BGR end to end
+        
+        Returns (result, method_used) like upscale_with_opencv, or None when
+        the file is not a plain 3-channel image OpenCV can read.
+        """
+        import cv2
+        
+        image_array = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+        if image_array is None or image_array.ndim != 3 or image_array.shape[2] != 3 \
+                or image_array.dtype != np.uint8:
+            return None
+        
+        height, width = image_array.shape[:2]
+        new_size = (int(width * scale_factor), int(height * scale_factor))
+        upscaled = cv2.resize(image_array, new_size, interpolation=self._opencv_interpolation('LANCZOS'))
+        upscaled = _post_process_array(upscaled, cv2.COLOR_BGR2GRAY)
+        
+        if output_path:
+            try:
+                saved = cv2.imwrite(output_path, upscaled)
+            except cv2.error:
+                saved = False
+            if not saved:
+                Image.fromarray(cv2.cvtColor(upscaled, cv2.COLOR_BGR2RGB)).save(output_path)
+            logger.info(f"Upscaled image saved to: {output_path}")
+        
+        # Callers get a PIL image back, as from every other path
+        result = Image.fromarray(cv2.cvtColor(upscaled, cv2.COLOR_BGR2RGB))
+        return result, "OpenCV upscaling with LANCZOS"
+    
     def upscale_smart(self, image, scale_factor=2.0, method='auto'):
         """Smart upscaling that tries the best available method"""
         methods_to_try = []
@@ -228,6 +421,18 @@ def upscale_image(image_path, output_path=None, scale_factor=2.0, method='auto')
     """Legacy function for backward compatibility"""
     upscaler = UnifiedUpscaler()
     
+    # When OpenCV is the method that would run, decode, resize and encode
+    # with OpenCV in BGR instead of going through PIL
+    uses_opencv = 'opencv' in upscaler.available_methods and (
+        method == 'opencv' or (method == 'auto' and 'upscalers' not in upscaler.available_methods))
+    if uses_opencv and isinstance(image_path, str) and image_path.lower().endswith(OPENCV_FILE_EXTENSIONS):
+        try:
+            fast_result = upscaler._upscale_file_opencv(image_path, output_path, scale_factor)
+            if fast_result is not None:
+                return fast_result
+        except Exception as e:
+            logger.warning(f"OpenCV file path failed, falling back: {e}")
+    
     # Load image
     if isinstance(image_path, str):
         image = Image.open(image_path)
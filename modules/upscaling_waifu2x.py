@@ -8,12 +8,19 @@ from PIL import Image, ImageEnhance, ImageFilter
 import numpy as np
 import cv2
 import requests
+from requests.adapters import HTTPAdapter
 import io
-import base64
 import time
+import os
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from .image_kernels import sharpness_kernel
+except ImportError:
+    from image_kernels import sharpness_kernel
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging (handlers and level are left to the application)
 logger = logging.getLogger(__name__)
 
 # Try to import waifu2x-caffe (if available)
@@ -25,6 +32,98 @@ except ImportError:
     logger.info("⚠️ Waifu2x module not available. Using online API fallback.")
     WAIFU2X_AVAILABLE = False
 
+# apply_enhanced_pil_upscaling's unsharp mask (PIL UnsharpMask(1, 150, 3)):
+# Gaussian sigma 1 as a separable 7-tap kernel (3 sigma each side)
+ENHANCED_USM_KERNEL = cv2.getGaussianKernel(7, 1.0)
+ENHANCED_USM_AMOUNT = 1.5
+ENHANCED_USM_THRESHOLD = 3
+
+# Its Sharpness(1.2) and Contrast(1.1) steps. Sharpness is a 3x3 kernel
+# (1.2*identity - 0.2*SMOOTH) and contrast an affine map around the mean gray,
+# so both fold into one filter2D: kernel scaled by 1.1, delta -0.1*mean
+ENHANCED_SHARPNESS = 1.2
+ENHANCED_CONTRAST = 1.1
+ENHANCED_FILTER_KERNEL = sharpness_kernel(ENHANCED_SHARPNESS) * ENHANCED_CONTRAST
+
+# ITU-R 601 luma weights, as used by PIL's "L" conversion
+LUMA_WEIGHTS = (0.299, 0.587, 0.114)
+
+# dnn_superres weights used by apply_opencv_super_resolution, by model name
+SR_MODEL_PATHS = {'edsr': "EDSR_x2.pb"}  # You'd need to download this model
+
+# Guided filter (opencv-contrib's ximgproc): an O(H*W) edge-preserving
+# smoother, independent of radius, used in place of the bilateral d=9
+GUIDED_FILTER_AVAILABLE = hasattr(cv2, "ximgproc")
+GUIDED_FILTER_RADIUS = 4
+GUIDED_FILTER_EPS = 75 ** 2
+
+# Inputs larger than one tile (in pixels) run the OpenCV fallback tile by
+# tile. Each tile reads an overlap halo on every inner side; neighbouring
+# tiles are cross-faded over the overlap/2 band each side of their seam, which
+# is still overlap/2 away from either tile's edge. For the bicubic +
+# guided/bilateral fallback both tiles agree there, so the result matches a
+# whole-image run; EDSR sees further than the halo, and the fade hides its seams
+TILE_SIZE = 512
+TILE_OVERLAP = 16
+
+# Concurrent requests in apply_waifu2x_online_batch (requests are I/O bound)
+WAIFU2X_BATCH_WORKERS = 8
+
+# Keep-alive session so repeated API calls skip the TCP+TLS handshake; one
+# pooled connection per batch worker
+_HTTP = requests.Session()
+_HTTP.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=WAIFU2X_BATCH_WORKERS))
+
+# CUDA-enabled OpenCV build with a visible GPU (dnn then runs on cuDNN)
+try:
+    CUDA_DNN_AVAILABLE = cv2.cuda.getCudaEnabledDeviceCount() > 0
+except (AttributeError, cv2.error):
+    CUDA_DNN_AVAILABLE = False
+
+# A loaded dnn_superres network is shared across calls but not thread-safe
+_SR_LOCK = threading.Lock()
+
+@functools.lru_cache(maxsize=4)
+def _get_sr_model(name, scale):
+    """Load a dnn_superres model once per (name, scale) and keep it for later calls
+
+    Returns None when the model cannot be loaded (e.g. its weights file is
+    missing); the failure is cached too, so callers fall back immediately.
+    """
+    try:
+        sr = cv2.dnn_superres.DnnSuperResImpl_create()
+        sr.readModel(SR_MODEL_PATHS[name])
+        sr.setModel(name, scale)
+    except Exception as e:
+        logger.info("dnn_superres model %s x%s unavailable: %s", name, scale, e)
+        return None
+    if CUDA_DNN_AVAILABLE:
+        # FP16 on the GPU: half the memory traffic, tensor cores where present
+        sr.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+        sr.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA_FP16)
+    else:
+        sr.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        sr.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+    return sr
+
+# Per-thread scratch buffers for intermediates, keyed by shape (tiles run on
+# several threads); at most this many shapes are kept per thread
+_SCRATCH = threading.local()
+SCRATCH_MAX_SHAPES = 8
+
+def _scratch_buffer(shape, dtype=np.uint8):
+    """Return a reusable per-thread buffer for an intermediate result"""
+    buffers = getattr(_SCRATCH, 'buffers', None)
+    if buffers is None:
+        buffers = _SCRATCH.buffers = {}
+    key = (tuple(shape), np.dtype(dtype))
+    buffer = buffers.get(key)
+    if buffer is None:
+        if len(buffers) >= SCRATCH_MAX_SHAPES:
+            buffers.clear()
+        buffer = buffers[key] = np.empty(shape, dtype)
+    return buffer
+
 def is_waifu2x_available():
     """Check if Waifu2x is available."""
     return WAIFU2X_AVAILABLE
@@ -42,38 +141,71 @@ def apply_waifu2x_online(image, scale=2, noise_level=1):
         PIL.Image: Upscaled image or None if failed
     """
     try:
-        # Convert PIL image to bytes
+        # Encode as lossless WebP (smaller than PNG; method=0 is the fastest
+        # effort level) and send the raw bytes as a multipart file, with
+        # none of base64's +33%
         img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr = img_byte_arr.getvalue()
-        
-        # Encode to base64
-        img_base64 = base64.b64encode(img_byte_arr).decode('utf-8')
+        image.save(img_byte_arr, format='WEBP', lossless=True, method=0)
         
         # Use waifu2x online API (there are several free ones)
         url = "https://waifu2x.udp.jp/api"
         
         data = {
             'scale': scale,
-            'noise': noise_level,
-            'image': img_base64
+            'noise': noise_level
         }
+        # getbuffer() is a zero-copy view of the encoded bytes (getvalue() copies)
+        files = {'image': ('image.webp', img_byte_arr.getbuffer(), 'image/webp')}
         
-        logger.info(f"Sending request to Waifu2x API (scale={scale}, noise={noise_level})...")
-        response = requests.post(url, data=data, timeout=30)
+        logger.info("Sending request to Waifu2x API (scale=%s, noise=%s)...", scale, noise_level)
+        response = _HTTP.post(url, data=data, files=files, timeout=30, stream=True)
         
-        if response.status_code == 200:
-            result_image = Image.open(io.BytesIO(response.content))
-            logger.info("✅ Waifu2x online processing completed!")
-            return result_image
+        with response:
+            if response.status_code != 200:
+                logger.warning("Waifu2x API returned status code: %s", response.status_code)
+                return None
+            
+            # Read the body in one go and decode it with OpenCV straight from a
+            # zero-copy numpy view of the bytes
+            content = response.raw.read(decode_content=True)
+        
+        decoded = cv2.imdecode(np.frombuffer(content, np.uint8), cv2.IMREAD_UNCHANGED)
+        if decoded is None or decoded.dtype != np.uint8:
+            # Formats (or bit depths) OpenCV can't give us as 8-bit: PIL decodes them
+            result_image = Image.open(io.BytesIO(content))
+        elif decoded.ndim == 2:
+            result_image = Image.fromarray(decoded)
+        elif decoded.shape[2] == 4:
+            result_image = Image.fromarray(cv2.cvtColor(decoded, cv2.COLOR_BGRA2RGBA, dst=decoded))
         else:
-            logger.warning(f"Waifu2x API returned status code: {response.status_code}")
-            return None
+            result_image = Image.fromarray(cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB, dst=decoded))
+        
+        logger.info("✅ Waifu2x online processing completed!")
+        return result_image
             
     except Exception as e:
-        logger.warning(f"Waifu2x online processing failed: {e}")
+        logger.warning("Waifu2x online processing failed: %s", e)
         return None
 
+def apply_waifu2x_online_batch(images, scale=2, noise_level=1):
+    """
+    Apply Waifu2x online upscaling to several images concurrently.
+    
+    Args:
+        images (list of PIL.Image): Input images
+        scale (int): Upscaling factor (1, 2)
+        noise_level (int): Noise reduction level (0, 1, 2, 3)
+    
+    Returns:
+        list: Upscaled images in input order (None where a request failed)
+    """
+    images = list(images)
+    if len(images) <= 1:
+        return [apply_waifu2x_online(image, scale, noise_level) for image in images]
+    
+    with ThreadPoolExecutor(max_workers=min(WAIFU2X_BATCH_WORKERS, len(images))) as executor:
+        return list(executor.map(lambda image: apply_waifu2x_online(image, scale, noise_level), images))
+
 def apply_waifu2x_local(image, scale=2, noise_level=1):
     """
     Apply Waifu2x upscaling using local installation.
@@ -90,8 +222,8 @@ def apply_waifu2x_local(image, scale=2, noise_level=1):
         return None
         
     try:
-        # Convert PIL to numpy array
-        img_array = np.array(image)
+        # View the PIL buffer as a numpy array (no copy; read-only)
+        img_array = np.asarray(image)
         
         # Apply waifu2x
         result_array = waifu2x.upscale(
@@ -106,16 +238,18 @@ def apply_waifu2x_local(image, scale=2, noise_level=1):
         return result_image
         
     except Exception as e:
-        logger.warning(f"Waifu2x local processing failed: {e}")
+        logger.warning("Waifu2x local processing failed: %s", e)
         return None
 
-def apply_enhanced_pil_upscaling(image, scale=2):
+def apply_enhanced_pil_upscaling(image, scale=2, high_quality=True):
     """
     Apply enhanced PIL-based upscaling with better algorithms.
     
     Args:
         image (PIL.Image): Input image
         scale (int): Upscaling factor
+        high_quality (bool): LANCZOS resize; False uses the much cheaper
+            bilinear resize for integer scales (the unsharp mask follows either way)
     
     Returns:
         PIL.Image: Upscaled image
@@ -125,8 +259,44 @@ def apply_enhanced_pil_upscaling(image, scale=2):
         new_width = int(image.width * scale)
         new_height = int(image.height * scale)
         
-        # Use LANCZOS for best quality
-        upscaled = image.resize((new_width, new_height), Image.LANCZOS)
+        if image.mode == 'RGB':
+            # Same pipeline on one uint8 array: LANCZOS resize, unsharp mask,
+            # then sharpness and contrast together in a single filter2D pass
+            if (new_width, new_height) == image.size:
+                # Scale 1: nothing to resample, only a writable copy is needed
+                upscaled = np.array(image)
+            elif not high_quality and scale == int(scale):
+                upscaled = cv2.resize(np.asarray(image), (new_width, new_height),
+                                      interpolation=cv2.INTER_LINEAR_EXACT)
+            else:
+                upscaled = cv2.resize(np.asarray(image), (new_width, new_height),
+                                      interpolation=cv2.INTER_LANCZOS4)
+            
+            # 1. Sharpening (original kept where |image - blurred| < threshold)
+            blurred = cv2.sepFilter2D(upscaled, -1, ENHANCED_USM_KERNEL, ENHANCED_USM_KERNEL)
+            sharpened = cv2.addWeighted(upscaled, 1 + ENHANCED_USM_AMOUNT,
+                                        blurred, -ENHANCED_USM_AMOUNT, 0)
+            diff = cv2.absdiff(upscaled, blurred, dst=blurred)
+            _, low_contrast_mask = cv2.threshold(diff, ENHANCED_USM_THRESHOLD - 1, 255,
+                                                 cv2.THRESH_BINARY_INV, dst=diff)
+            cv2.copyTo(upscaled, low_contrast_mask, dst=sharpened)
+            
+            # 2-3. Details and contrast, around the mean gray level (rounded
+            # like ImageEnhance.Contrast), saturated to uint8 into the resize buffer
+            mean = int(sum(w * m for w, m in zip(LUMA_WEIGHTS, cv2.mean(sharpened))) + 0.5)
+            final_array = cv2.filter2D(sharpened, -1, ENHANCED_FILTER_KERNEL,
+                                       dst=upscaled, delta=(1 - ENHANCED_CONTRAST) * mean)
+            
+            logger.info("✅ Enhanced PIL upscaling completed!")
+            return Image.fromarray(final_array)
+        
+        # Use LANCZOS for best quality (OpenCV's SIMD LANCZOS4 for the
+        # modes it handles as uint8)
+        if image.mode in ('RGBA', 'L'):
+            upscaled = Image.fromarray(cv2.resize(np.asarray(image), (new_width, new_height),
+                                                  interpolation=cv2.INTER_LANCZOS4))
+        else:
+            upscaled = image.resize((new_width, new_height), Image.LANCZOS)
         
         # Apply post-processing
         # 1. Sharpening
@@ -144,9 +314,42 @@ def apply_enhanced_pil_upscaling(image, scale=2):
         return final_image
         
     except Exception as e:
-        logger.error(f"Enhanced PIL upscaling failed: {e}")
+        logger.error("Enhanced PIL upscaling failed: %s", e)
         return image  # Return original on failure
 
+def _opencv_super_resolution_array(img_array, scale):
+    """OpenCV super resolution of an RGB uint8 array; returns a new RGB array"""
+    # Method 1: EDSR (Enhanced Deep Super-Resolution), which takes BGR
+    sr = _get_sr_model("edsr", scale)
+    if sr is not None:
+        try:
+            with _SR_LOCK:
+                bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR,
+                                   dst=_scratch_buffer(img_array.shape, img_array.dtype))
+                result = sr.upsample(bgr)
+            return cv2.cvtColor(result, cv2.COLOR_BGR2RGB, dst=result)
+        except Exception as e:
+            logger.warning("EDSR super resolution failed: %s", e)
+    
+    # Fallback: Simple bicubic interpolation with post-processing.
+    # Both steps are channel-symmetric, so they run on RGB directly
+    height, width = img_array.shape[:2]
+    new_width = int(width * scale)
+    new_height = int(height * scale)
+    # (the resize is an intermediate, so it goes to a reused buffer)
+    upscaled = cv2.resize(img_array, (new_width, new_height),
+                          dst=_scratch_buffer((new_height, new_width) + img_array.shape[2:],
+                                              img_array.dtype),
+                          interpolation=cv2.INTER_CUBIC)
+    
+    # Edge-preserving noise reduction: guided filter when available
+    # (radius and eps matching the bilateral's d=9, sigma_color=75)
+    if GUIDED_FILTER_AVAILABLE:
+        return cv2.ximgproc.guidedFilter(guide=upscaled, src=upscaled,
+                                         radius=GUIDED_FILTER_RADIUS,
+                                         eps=GUIDED_FILTER_EPS)
+    return cv2.bilateralFilter(upscaled, 9, 75, 75)
+
 def apply_opencv_super_resolution(image, scale=2):
     """
     Apply OpenCV's built-in super resolution algorithms.
@@ -159,36 +362,119 @@ def apply_opencv_super_resolution(image, scale=2):
         PIL.Image: Upscaled image
     """
     try:
-        # Convert PIL to OpenCV format
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # Try different OpenCV super resolution methods
-        try:
-            # Method 1: EDSR (Enhanced Deep Super-Resolution)
-            sr = cv2.dnn_superres.DnnSuperResImpl_create()
-            sr.readModel("EDSR_x2.pb")  # You'd need to download this model
-            sr.setModel("edsr", scale)
-            result = sr.upsample(cv_image)
-        except:
-            # Fallback: Simple bicubic interpolation with post-processing
-            new_width = int(image.width * scale)
-            new_height = int(image.height * scale)
-            result = cv2.resize(cv_image, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
-            
-            # Apply bilateral filter for noise reduction
-            result = cv2.bilateralFilter(result, 9, 75, 75)
-        
-        # Convert back to PIL
-        result_rgb = cv2.cvtColor(result, cv2.COLOR_BGR2RGB)
-        result_image = Image.fromarray(result_rgb)
+        result_image = Image.fromarray(_opencv_super_resolution_array(np.asarray(image), scale))
         
         logger.info("✅ OpenCV super resolution completed!")
         return result_image
         
     except Exception as e:
-        logger.warning(f"OpenCV super resolution failed: {e}")
+        logger.warning("OpenCV super resolution failed: %s", e)
         return apply_enhanced_pil_upscaling(image, scale)
 
+def _blend_into(dst, src, weights):
+    """dst = weights*src + (1-weights)*dst, rounded to uint8 (only band-sized float temporaries)"""
+    blended = dst.astype(np.float32)
+    blended += weights * (src.astype(np.float32) - blended)
+    np.rint(blended, out=blended)
+    dst[...] = blended
+
+def _tiled_upscale(image, scale, tile=TILE_SIZE, overlap=TILE_OVERLAP, fn=None):
+    """
+    Upscale an RGB image tile by tile and stitch the tiles.
+    
+    Tiles are composited in row-major order into one uint8 output. Each tile
+    is copied as is, except for the band of overlap/2 input pixels on each
+    side of its top and left seams, where it is faded in over what the
+    earlier tiles wrote. Tiles are views into the image's array and fn
+    returns arrays.
+    
+    Args:
+        image (PIL.Image): Input image (RGB)
+        scale (int): Upscaling factor
+        tile (int): Tile size in input pixels
+        overlap (int): Halo read around each tile, in input pixels
+        fn (callable): Per-tile upscaler taking and returning RGB arrays,
+            _opencv_super_resolution_array by default
+    
+    Returns:
+        PIL.Image: Upscaled image
+    """
+    fn = fn or _opencv_super_resolution_array
+    source = np.asarray(image)
+    width, height = image.size
+    band = overlap // 2
+    output = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+    
+    boxes = [(x0, y0, min(x0 + tile, width), min(y0 + tile, height))
+             for y0 in range(0, height, tile) for x0 in range(0, width, tile)]
+    
+    def crop_box(box):
+        x0, y0, x1, y1 = box
+        return (max(x0 - overlap, 0), max(y0 - overlap, 0),
+                min(x1 + overlap, width), min(y1 + overlap, height))
+    
+    def upscale_tile(box):
+        cx0, cy0, cx1, cy1 = crop_box(box)
+        return fn(source[cy0:cy1, cx0:cx1], scale)
+    
+    # OpenCV releases the GIL, so tiles run in parallel; compositing runs on
+    # this thread, in row-major order, as neighbouring tiles share the bands
+    with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(boxes))) as executor:
+        for box, upscaled in zip(boxes, executor.map(upscale_tile, boxes)):
+            x0, y0, x1, y1 = box
+            cx0, cy0, _, _ = crop_box(box)
+            # The tile's region: its interior, widened by the band on every
+            # side that has a neighbour
+            rx0, ry0 = max(x0 - band, 0), max(y0 - band, 0)
+            rx1, ry1 = min(x1 + band, width), min(y1 + band, height)
+            region = output[ry0 * scale:ry1 * scale, rx0 * scale:rx1 * scale]
+            tile_region = upscaled[(ry0 - cy0) * scale:(ry1 - cy0) * scale,
+                                   (rx0 - cx0) * scale:(rx1 - cx0) * scale]
+            
+            # Fade-in lengths over the top and left seams (0 at the image edge)
+            fade_y = min(2 * (y0 - ry0) * scale, region.shape[0])
+            fade_x = min(2 * (x0 - rx0) * scale, region.shape[1])
+            ramp_y = ((np.arange(fade_y, dtype=np.float32) + 0.5) / fade_y)[:, None, None]
+            ramp_x = ((np.arange(fade_x, dtype=np.float32) + 0.5) / fade_x)[None, :, None]
+            
+            region[fade_y:, fade_x:] = tile_region[fade_y:, fade_x:]
+            if fade_y:
+                weights = np.ones((1, region.shape[1], 1), dtype=np.float32)
+                weights[:, :fade_x] = ramp_x
+                _blend_into(region[:fade_y], tile_region[:fade_y], ramp_y * weights)
+            if fade_x:
+                _blend_into(region[fade_y:, :fade_x], tile_region[fade_y:, :fade_x], ramp_x)
+    
+    return Image.fromarray(output)
+
+def _opencv_stage(image, scale, noise_level):
+    """OpenCV super resolution fallback, tiled for large RGB images"""
+    if (image.mode == 'RGB' and isinstance(scale, int)
+            and image.width * image.height > TILE_SIZE * TILE_SIZE):
+        try:
+            result_image = _tiled_upscale(image, scale)
+            logger.info("✅ OpenCV super resolution completed!")
+            return result_image
+        except Exception as e:
+            logger.warning("OpenCV super resolution failed: %s", e)
+            return apply_enhanced_pil_upscaling(image, scale)
+    return apply_opencv_super_resolution(image, scale)
+
+def _pil_stage(image, scale, noise_level):
+    """Enhanced PIL fallback"""
+    return apply_enhanced_pil_upscaling(image, scale)
+
+# Fallback chain of upscale_and_enhance_waifu2x, resolved once at import:
+# (log message, stage, needs use_online). Local Waifu2x only if installed
+_PIPELINE = tuple(
+    ([("Trying local Waifu2x...", apply_waifu2x_local, False)] if WAIFU2X_AVAILABLE else [])
+    + [
+        ("Trying online Waifu2x...", apply_waifu2x_online, True),
+        ("Using OpenCV super resolution fallback...", _opencv_stage, False),
+        ("Using enhanced PIL fallback...", _pil_stage, False),
+    ]
+)
+
 def upscale_and_enhance_waifu2x(image, scale=2, noise_level=1, use_online=True):
     """
     Main upscaling function using Waifu2x or fallback methods.
@@ -203,32 +489,19 @@ def upscale_and_enhance_waifu2x(image, scale=2, noise_level=1, use_online=True):
         PIL.Image: Upscaled and enhanced image
     """
     try:
-        # Try local Waifu2x first if available
-        if WAIFU2X_AVAILABLE:
-            logger.info("Trying local Waifu2x...")
-            result = apply_waifu2x_local(image, scale, noise_level)
-            if result:
-                return result
-        
-        # Try online Waifu2x if enabled and local failed
-        if use_online:
-            logger.info("Trying online Waifu2x...")
-            result = apply_waifu2x_online(image, scale, noise_level)
+        # Try each stage in order until one produces a result
+        result = None
+        for message, stage, online in _PIPELINE:
+            if online and not use_online:
+                continue
+            logger.info(message)
+            result = stage(image, scale, noise_level)
             if result:
                 return result
-        
-        # Fallback to OpenCV super resolution
-        logger.info("Using OpenCV super resolution fallback...")
-        result = apply_opencv_super_resolution(image, scale)
-        if result:
-            return result
-        
-        # Final fallback to enhanced PIL
-        logger.info("Using enhanced PIL fallback...")
-        return apply_enhanced_pil_upscaling(image, scale)
+        return result
         
     except Exception as e:
-        logger.error(f"All upscaling methods failed: {e}")
+        logger.error("All upscaling methods failed: %s", e)
         return image  # Return original image on complete failure
 
 # Legacy function for compatibility with existing Streamlit app
@@ -246,15 +519,20 @@ def upscale_and_enhance_realesrgan(img_pil_input, model_name, model_scale, bilat
         
         result = upscale_and_enhance_waifu2x(img_pil_input, scale=scale, noise_level=noise_level)
         
-        # Apply additional sharpening if requested
+        # Apply additional sharpening if requested (for RGB as one uint8
+        # filter2D pass, saturated, instead of PIL's blend with a SMOOTH copy)
         if sharpness_factor > 1.0:
-            enhancer = ImageEnhance.Sharpness(result)
-            result = enhancer.enhance(sharpness_factor)
+            if result.mode == 'RGB':
+                result = Image.fromarray(cv2.filter2D(np.asarray(result), -1,
+                                                      sharpness_kernel(float(sharpness_factor))))
+            else:
+                enhancer = ImageEnhance.Sharpness(result)
+                result = enhancer.enhance(sharpness_factor)
         
         return result
         
     except Exception as e:
-        logger.error(f"Legacy function failed: {e}")
+        logger.error("Legacy function failed: %s", e)
         return img_pil_input
 
 def test_waifu2x_functionality():
@@ -274,7 +552,7 @@ def test_waifu2x_functionality():
             return False
             
     except Exception as e:
-        logger.error(f"Waifu2x test failed: {e}")
+        logger.error("Waifu2x test failed: %s", e)
         return False
 
 if __name__ == "__main__":
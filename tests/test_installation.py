@@ -143,7 +143,11 @@ def test_streamlit_app():
         return True  # Consider OK if it's just a warning
 
 def test_functional():
-    """Test actual functionality with a small test image."""
+    """Test actual functionality with a small test image.
+
+    The Real-ESRGAN model only runs with RUN_HEAVY_TESTS=1; otherwise the
+    quick resize check below stands in for it.
+    """
     print("\n🧪 Testing functionality...")
     
     try:
@@ -151,10 +155,12 @@ def test_functional():
         from PIL import Image
         test_img = Image.new('RGB', (50, 50), color='red')
         
-        # Test Real-ESRGAN if available
-        from upscaling_realce_realesrgan import is_realesrgan_available, upscale_and_enhance_realesrgan
+        # Test Real-ESRGAN if requested and available
+        run_heavy = os.environ.get("RUN_HEAVY_TESTS") == "1"
+        if run_heavy:
+            from upscaling_realce_realesrgan import is_realesrgan_available, upscale_and_enhance_realesrgan
         
-        if is_realesrgan_available():
+        if run_heavy and is_realesrgan_available():
             print("Testing Real-ESRGAN upscaling...")
             # Use correct parameters for the legacy function
             result = upscale_and_enhance_realesrgan(
@@ -173,7 +179,10 @@ def test_functional():
                 print("❌ Real-ESRGAN functional test: FAILED")
                 return False
         else:
-            print("⚠️ Real-ESRGAN not available, testing fallback...")
+            if run_heavy:
+                print("⚠️ Real-ESRGAN not available, testing fallback...")
+            else:
+                print("⚠️ Skipping the Real-ESRGAN model (set RUN_HEAVY_TESTS=1 to run it), testing fallback...")
             # Test fallback method - using basic PIL upscaling for test
             try:
                 # Simple test - just create a larger image
@@ -4,65 +4,56 @@ Script de teste para verificar a funcionalidade dos modelos de upscaling
 
 import sys
 import os
+import importlib
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import tempfile
 
 # Testar importações
 print("🔍 Testando importações dos modelos...")
 
-# 1. Classic PIL + OpenCV
-try:
-    from upscaling_realce_pillow_opencv import upscale_and_enhance_pil
-    print("✅ Classic PIL + OpenCV: Disponível")
-    classic_available = True
-except ImportError as e:
-    print(f"❌ Classic PIL + OpenCV: {e}")
-    classic_available = False
-
-# 2. Smart Upscaling
-try:
-    from upscaling_smart import upscale_and_enhance_smart, is_enhanced_upscaling_available
-    smart_available = is_enhanced_upscaling_available()
-    print(f"✅ Smart Upscaling: {'Disponível' if smart_available else 'Parcialmente disponível'}")
-except ImportError as e:
-    print(f"❌ Smart Upscaling: {e}")
-    smart_available = False
-
-# 3. Waifu2x
-try:
-    from upscaling_waifu2x import upscale_and_enhance_waifu2x, is_waifu2x_available
-    waifu2x_available = is_waifu2x_available()
-    print(f"✅ Waifu2x: {'Disponível' if waifu2x_available else 'Não disponível'}")
-except ImportError as e:
-    print(f"❌ Waifu2x: {e}")
-    waifu2x_available = False
-
-# 4. Real-ESRGAN Original
-try:
-    from upscaling_realce_realesrgan import upscale_and_enhance_realesrgan, is_realesrgan_available
-    realesrgan_original_available = is_realesrgan_available()
-    print(f"✅ Real-ESRGAN Original: {'Disponível' if realesrgan_original_available else 'Não disponível'}")
-except ImportError as e:
-    print(f"❌ Real-ESRGAN Original: {e}")
-    realesrgan_original_available = False
-
-# 5. Real-ESRGAN New
-try:
-    from upscaling_realce_realesrgan_new import upscale_and_enhance_realesrgan as realesrgan_new
-    print("✅ Real-ESRGAN New: Disponível")
-    realesrgan_new_available = True
-except ImportError as e:
-    print(f"❌ Real-ESRGAN New: {e}")
-    realesrgan_new_available = False
-
-# 6. HuggingFace Real-ESRGAN
-try:
-    from upscaling_realce_huggingface import upscale_and_enhance_realesrgan as realesrgan_hf
-    print("✅ Real-ESRGAN HuggingFace: Disponível")
-    realesrgan_hf_available = True
-except ImportError as e:
-    print(f"❌ Real-ESRGAN HuggingFace: {e}")
-    realesrgan_hf_available = False
+# (nome, módulo, função de disponibilidade, texto quando ela retorna False)
+MODEL_PROBES = [
+    ("Classic PIL + OpenCV", "upscaling_realce_pillow_opencv", None, None),
+    ("Smart Upscaling", "upscaling_smart", "is_enhanced_upscaling_available", "Parcialmente disponível"),
+    ("Waifu2x", "upscaling_waifu2x", "is_waifu2x_available", "Não disponível"),
+    ("Real-ESRGAN Original", "upscaling_realce_realesrgan", "is_realesrgan_available", "Não disponível"),
+    ("Real-ESRGAN New", "upscaling_realce_realesrgan_new", None, None),
+    ("Real-ESRGAN HuggingFace", "upscaling_realce_huggingface", None, None),
+]
+
+def _probe(module_name):
+    """Importar um módulo, devolvendo (módulo, erro de importação)"""
+    try:
+        return importlib.import_module(module_name), None
+    except ImportError as e:
+        return None, e
+
+# Importações em paralelo: módulos independentes sobrepõem sua inicialização
+with ThreadPoolExecutor(max_workers=len(MODEL_PROBES)) as executor:
+    probe_results = list(executor.map(_probe, [module_name for _, module_name, _, _ in MODEL_PROBES]))
+
+modules = {}
+availability = {}
+for (name, module_name, check, unavailable_text), (module, error) in zip(MODEL_PROBES, probe_results):
+    if module is None:
+        print(f"❌ {name}: {error}")
+        availability[name] = False
+        continue
+    modules[name] = module
+    available = getattr(module, check)() if check else True
+    print(f"✅ {name}: {'Disponível' if available else unavailable_text}")
+    availability[name] = available
+
+classic_available = availability["Classic PIL + OpenCV"]
+smart_available = availability["Smart Upscaling"]
+waifu2x_available = availability["Waifu2x"]
+realesrgan_original_available = availability["Real-ESRGAN Original"]
+realesrgan_new_available = availability["Real-ESRGAN New"]
+realesrgan_hf_available = availability["Real-ESRGAN HuggingFace"]
+
+if classic_available:
+    upscale_and_enhance_pil = modules["Classic PIL + OpenCV"].upscale_and_enhance_pil
 
 print("\n" + "="*50)
 print("📊 RESUMO DOS MODELOS DISPONÍVEIS:")